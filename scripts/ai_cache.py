@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+DEFAULT_MAX_SIZE = 256
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+
+class _SharedStream:
+    """
+    Chunks of a streamed value, replayed to every reader from the first chunk on.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def publish(self, chunk):
+        with self.condition:
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+
+    def __iter__(self):
+        position = 0
+        while True:
+            with self.condition:
+                while position == len(self.chunks) and not self.done:
+                    self.condition.wait()
+                chunks = self.chunks[position:]
+                position = len(self.chunks)
+                done, error = self.done, self.error
+            yield from chunks
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+    def result(self):
+        return "".join(self)
+
+
+def _future_chunks(future):
+    yield future.result()
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache with TTL eviction and request coalescing.
+
+    When several threads ask for a key that is not cached, only the first one computes the value.
+    The others wait for that computation and receive its result, or its exception. Streamed values
+    are coalesced the same way, see `get_or_stream`. Failed computations are not cached, and neither
+    are values rejected by the caller's `accept` function.
+
+    Attributes:
+    - max_size (int): Maximum number of cached entries. The least recently used entry is evicted first.
+    - ttl_seconds (float): Age after which an entry is discarded.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at >= self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """
+        Return the cached value for a key without computing it.
+
+        Parameters:
+        - key (hashable): The cache key.
+
+        Returns:
+        - The cached value, or None if the key is not cached.
+        """
+        with self._lock:
+            entry = self._lookup(key)
+        return entry[1] if entry is not None else None
+
+    def get_or_compute(self, key, compute, accept=None):
+        """
+        Return the cached value for a key, computing it at most once across concurrent callers.
+
+        Parameters:
+        - key (hashable): The cache key.
+        - compute (callable): Function without arguments that produces the value.
+        - accept (callable, optional): Function `(value) -> bool` deciding whether a computed value is cached.
+          Rejected values are still returned to the callers waiting for them.
+
+        Returns:
+        - The cached or freshly computed value.
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry[1]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not owner:
+            # The value may also be streamed by `get_or_stream`, in which case `result` joins its chunks
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        cacheable = value is not None and (accept is None or accept(value))
+        with self._lock:
+            if cacheable:
+                self._store(key, value)
+            del self._in_flight[key]
+        future.set_result(value)
+        return value
+
+    def get_or_stream(self, key, stream, accept=None):
+        """
+        Return the chunks of a streamed text value, streaming it at most once across concurrent callers.
+
+        The first caller starts `stream` in a background thread, so the stream completes and is cached even
+        if that caller stops reading. Every caller, including the first, reads the chunks as they arrive,
+        from the first chunk on. A cached value is returned as a single chunk, and a value being computed
+        by `get_or_compute` is waited for.
+
+        Parameters:
+        - key (hashable): The cache key.
+        - stream (callable): Function without arguments returning an iterable of text chunks.
+        - accept (callable, optional): Function `(text) -> bool` deciding whether the complete text is cached.
+
+        Returns:
+        - iterator: The chunks of the value. Iterating raises the exception of a failed stream.
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return iter([entry[1]])
+            in_flight = self._in_flight.get(key)
+            owner = in_flight is None
+            if owner:
+                in_flight = self._in_flight[key] = _SharedStream()
+
+        if owner:
+            threading.Thread(target=self._pump, args=(key, in_flight, stream, accept), daemon=True).start()
+        elif isinstance(in_flight, Future):
+            return _future_chunks(in_flight)
+        return iter(in_flight)
+
+    def _pump(self, key, shared, stream, accept):
+        try:
+            for chunk in stream():
+                shared.publish(chunk)
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            shared.finish(e)
+            return
+
+        value = "".join(shared.chunks)
+        cacheable = bool(value) and (accept is None or accept(value))
+        with self._lock:
+            if cacheable:
+                self._store(key, value)
+            del self._in_flight[key]
+        shared.finish()
+
+    def clear(self):
+        """
+        Remove every cached entry. Computations in flight are not affected.
+        """
+        with self._lock:
+            self._entries.clear()
@@ -1,13 +1,76 @@
-from groq import Groq
 import json
+import threading
+import time
+from ai_cache import ResponseCache
+from investments import validate_investments
+from json_stream import JsonArrayStream
+from portfolio_store import portfolio_store
+from timing import record, span, timed
 
 groq_api = "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"
-client = Groq(api_key=groq_api)
+_client = None
+_client_lock = threading.Lock()
 
-def get_portfolio(user_data):
+MODEL = "llama3-70b-8192"
+SEED = 42
+SYSTEM_PROMPT = (
+    "You are an expert in financial advice. Your task is to generate a comprehensive investment portfolio for a client based on the details provided. "
+    "Output should be in valid JSON format without any text around the JSON output. "
+    "Tickers should be the ones used on Yahoo Finance, in the format 'AAPL', 'GOOGL', 'MSFT', etc. "
+    "Only output the investment recommendations and rationale in the specified format."
+)
+
+# Identical prompts are deterministic thanks to the fixed seed, so their responses can be shared
+response_cache = ResponseCache()
+
+def get_client():
+    """
+    Return the Groq client shared by the module, importing `groq` and building the client on first use.
+
+    Returns:
+        Groq: The shared client.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from groq import Groq
+                _client = Groq(api_key=groq_api)
+    return _client
+
+def build_user_message(user_data):
+    """
+    Build the prompt describing the client for the AI model.
+
+    Args:
+        user_data (dict): The client's details, see `get_portfolio`.
+
+    Returns:
+        str: The user message sent to the model.
+    """
+    return (
+        f"Create a diversified investment portfolio for a client with the following details:\n"
+        f"Age: {user_data['age']}\n"
+        f"Initial_investment: {user_data['Initial_investment']}\n"
+        f"Monthly Contribution: {user_data['monthly_contribution']}\n"
+        f"Retirement Age: {user_data['retirement_age']}\n"
+        f"Ethical Values: {', '.join(user_data['ethical_values'])}\n"
+        f"Risk Aversion: {user_data['risk_aversion']}\n"
+        "Ensure the portfolio includes a mix of stocks, bonds, and cash with detailed tickers only for stocks. "
+        "Do not include tickers for bonds and cash. "
+        "Return the portfolio as a JSON list with each item in the following format: "
+        '{"asset_name": "Asset Name", "ticker": "Ticker" (only for stocks, leave empty for bonds and cash), "allocation": "X%", "category": "Category (Stock/Bond/Cash)", "rationale": "Reason for choosing this asset"}.'
+    )
+
+@timed("ai.get_portfolio")
+def get_portfolio(user_data, ai_client=None, cache=response_cache):
     """
     Generate a diversified investment portfolio for a client based on the provided user data.
 
+    Responses are cached on (model, system prompt, user message, seed), and concurrent requests for
+    the same prompt wait for the first one instead of calling the model again. Only responses accepted
+    by `parse_investments` are cached, so retrying after an invalid response calls the model again.
+
     Args:
         user_data (dict): A dictionary containing the following details:
             - 'age' (int): The client's age.
@@ -16,6 +79,9 @@ def get_portfolio(user_data):
             - 'retirement_age' (int): The desired retirement age.
             - 'ethical_values' (list): A list of ethical values.
             - 'risk_aversion' (str): The client's risk aversion level.
+        ai_client (Groq, optional): The client used to call the model. Defaults to the shared client from `get_client`,
+            pass a client with a different `base_url` to target a local server.
+        cache (ResponseCache, optional): The response cache to use, None to always call the model.
 
     Returns:
         str: The generated investment portfolio as a JSON string. Each item in the portfolio is in the following format:
@@ -27,66 +93,155 @@ def get_portfolio(user_data):
                 "rationale": "Reason for choosing this asset"
             }
     """
-    user_message = (
-        f"Create a diversified investment portfolio for a client with the following details:\n"
-        f"Age: {user_data['age']}\n"
-        f"Initial_investment: {user_data['Initial_investment']}\n"
-        f"Monthly Contribution: {user_data['monthly_contribution']}\n"
-        f"Retirement Age: {user_data['retirement_age']}\n"
-        f"Ethical Values: {', '.join(user_data['ethical_values'])}\n"
-        f"Risk Aversion: {user_data['risk_aversion']}\n"
-        "Ensure the portfolio includes a mix of stocks, bonds, and cash with detailed tickers only for stocks. "
-        "Do not include tickers for bonds and cash. "
-        "Return the portfolio as a JSON list with each item in the following format: "
-        '{"asset_name": "Asset Name", "ticker": "Ticker" (only for stocks, leave empty for bonds and cash), "allocation": "X%", "category": "Category (Stock/Bond/Cash)", "rationale": "Reason for choosing this asset"}.'
-    )
+    ai_client = ai_client or get_client()
+    user_message = build_user_message(user_data)
 
-    chat_completion = client.chat.completions.create(
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are an expert in financial advice. Your task is to generate a comprehensive investment portfolio for a client based on the details provided. "
-                    "Output should be in valid JSON format without any text around the JSON output. "
-                    "Tickers should be the ones used on Yahoo Finance, in the format 'AAPL', 'GOOGL', 'MSFT', etc. "
-                    "Only output the investment recommendations and rationale in the specified format."
-                )
-            },
-            {
-                "role": "user",
-                "content": user_message,
-            }
-        ],
-        model="llama3-70b-8192", 
-        seed=42
-    )
+    def request_completion():
+        with span("ai.groq_completion", model=MODEL):
+            chat_completion = ai_client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "system",
+                        "content": SYSTEM_PROMPT
+                    },
+                    {
+                        "role": "user",
+                        "content": user_message,
+                    }
+                ],
+                model=MODEL,
+                seed=SEED
+            )
+        return chat_completion.choices[0].message.content
+
+    if cache is None:
+        return request_completion()
+    return cache.get_or_compute(cache_key(user_message), request_completion, accept=is_valid_response)
 
-    ai_response = chat_completion.choices[0].message.content
+def is_valid_response(ai_response):
+    """
+    Check whether an AI response holds valid investments and can be cached.
+    """
+    return parse_investments(ai_response) is not None
 
-    return ai_response
+def cache_key(user_message):
+    """
+    Key of a response in the response cache, shared by `get_portfolio` and `stream_portfolio`.
+    """
+    return (MODEL, SYSTEM_PROMPT, user_message, SEED)
+
+class PortfolioStream:
+    """
+    Investments of a streamed portfolio, yielded as soon as each one is complete.
+
+    Iterating over the stream yields the raw investment dictionaries of the AI response in order, before
+    they are validated. Once the stream is exhausted, `text` holds the full response, which is then
+    parsed with `parse_investments` like the response of `get_portfolio`.
+
+    Attributes:
+        text (str): The response received so far.
+        cached (bool): Whether the response was replayed from the cache instead of calling the model.
+        time_to_first_holding (float or None): Seconds until the first investment was complete, None before then.
+        elapsed (float or None): Seconds until the whole response was received, None before then.
+    """
 
+    def __init__(self, chunks, cached=False):
+        self._chunks = chunks
+        self._parser = JsonArrayStream()
+        self.cached = cached
+        self.time_to_first_holding = None
+        self.elapsed = None
+
+    @property
+    def text(self):
+        return self._parser.text
+
+    def __iter__(self):
+        started = time.perf_counter()
+        for chunk in self._chunks:
+            for item in self._parser.feed(chunk):
+                if self.time_to_first_holding is None:
+                    self.time_to_first_holding = time.perf_counter() - started
+                    record("ai.time_to_first_holding", self.time_to_first_holding, model=MODEL, cached=self.cached)
+                yield item
+        self.elapsed = time.perf_counter() - started
+        record("ai.stream_portfolio", self.elapsed, model=MODEL, cached=self.cached, holdings=len(self._parser.items))
+
+def stream_portfolio(user_data, ai_client=None, cache=response_cache):
+    """
+    Generate a portfolio like `get_portfolio`, streaming the response so each investment can be shown as it arrives.
+
+    A response already in the cache is replayed at once, and a streamed response is added to the cache
+    once it is complete and valid, so `get_portfolio` and `stream_portfolio` share their responses. Concurrent
+    requests for the same prompt share one model call: later callers replay the chunks of the first one.
+
+    Args:
+        user_data (dict): The client's details, see `get_portfolio`.
+        ai_client (Groq, optional): The client used to call the model. Defaults to the shared client from `get_client`.
+        cache (ResponseCache, optional): The response cache to use, None to always call the model.
+
+    Returns:
+        PortfolioStream: The investments of the response, yielded as they are completed.
+    """
+    user_message = build_user_message(user_data)
+    key = cache_key(user_message)
+
+    if cache is not None:
+        cached_response = cache.get(key)
+        if cached_response is not None:
+            return PortfolioStream([cached_response], cached=True)
+
+    def request_chunks():
+        chat_completion = (ai_client or get_client()).chat.completions.create(
+            messages=[
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": user_message,
+                }
+            ],
+            model=MODEL,
+            seed=SEED,
+            stream=True
+        )
+        for chunk in chat_completion:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    if cache is None:
+        return PortfolioStream(request_chunks())
+    return PortfolioStream(cache.get_or_stream(key, request_chunks, accept=is_valid_response))
+
+@timed("ai.parse_investments")
 def parse_investments(ai_response):
     """
-    Parses the AI response and returns the investments as a Python object.
+    Parses the AI response, validates it against the investment schema and normalizes it.
 
     Args:
         ai_response (str): The AI response in JSON format.
 
     Returns:
-        list or dict or None: The parsed investments as a Python object, or None if there was an error parsing the response.
+        list or None: The investments, each with its 'asset_name', 'ticker', 'category', 'weight' and 'rationale',
+            with weights adding up to 1 (see `investments.validate_investments`), or None if the response is invalid.
     """
     try:
-        investments = json.loads(ai_response)
+        investments = validate_investments(json.loads(ai_response))
         return investments
     except json.JSONDecodeError as e:
         print(f"JSON decode error: {e}")
+    except ValueError as e:
+        print(f"Invalid investments in AI response: {e}")
     except Exception as e:
         print(f"Error parsing AI response: {e}")
     return None
 
+@timed("store.save_portfolio")
 def save_portfolio(user_data, investments, portfolio_name):
     """
-    Saves the user's portfolio data to a JSON file.
+    Saves the user's portfolio data to the portfolio store.
 
     Parameters:
     user_data (dict): A dictionary containing user data.
@@ -94,46 +249,56 @@ def save_portfolio(user_data, investments, portfolio_name):
     portfolio_name (str): The name of the portfolio.
 
     Returns:
-    None
-    """
-    portfolio_data = {
-        "user_data": user_data,
-        "portfolio": investments,
-        "portfolio_name": portfolio_name
-    }
-    
-    all_portfolios = load_all_portfolios()
-    all_portfolios.append(portfolio_data)
-    
-    with open("portfolios.json", "w") as file:
-        json.dump(all_portfolios, file)
+    int: The id of the saved portfolio.
+    """
+    return portfolio_store.add(user_data, investments, portfolio_name)
 
+@timed("store.load_all_portfolios")
 def load_all_portfolios():
     """
-    Load all portfolios from the 'portfolios.json' file.
+    Load all portfolios from the portfolio store.
 
     Returns:
-        A list of portfolios loaded from the file.
-        If the file is not found or cannot be decoded as JSON, an empty list is returned.
+        A read-only tuple of portfolios, in the order they were saved, shared with other sessions until the store changes.
+        Portfolios from a legacy 'portfolios.json' file are migrated to the store on first use.
     """
-    try:
-        with open("portfolios.json", "r") as file:
-            return json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+    return portfolio_store.list_all()
+
+@timed("store.load_portfolio_names")
+def load_portfolio_names():
+    """
+    Load the names of all saved portfolios without decoding their contents.
+
+    Returns:
+        A read-only dictionary of portfolio names keyed by portfolio id, in the order they were saved.
+    """
+    return portfolio_store.list_names()
+
+@timed("store.load_portfolio")
+def load_portfolio(portfolio_id):
+    """
+    Load a single portfolio by id.
+
+    Parameters:
+    portfolio_id (int): The id of the portfolio, a key of `load_portfolio_names`.
 
+    Returns:
+    dict or None: The portfolio, read-only, None if there is none.
+    """
+    return portfolio_store.get(portfolio_id)
+
+@timed("store.check_existing_portfolio")
 def check_existing_portfolio(user_data):
     """
     Check if there is an existing portfolio for the given user data.
 
+    Profiles are compared by fingerprint, so the order of the ethical values does not matter.
+
     Parameters:
     user_data (dict): The user data to check against existing portfolios.
 
     Returns:
-    dict or None: The existing portfolio if found, None otherwise.
+    tuple or None: The read-only investments of the existing portfolio if found, None otherwise.
     """
-    all_portfolios = load_all_portfolios()
-    for portfolio in all_portfolios:
-        if portfolio['user_data'] == user_data:
-            return portfolio['portfolio']
-    return None
+    existing = portfolio_store.find_by_profile(user_data)
+    return existing['portfolio'] if existing else None
@@ -0,0 +1,341 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from investments import validate_investments
+from price_store import price_store, csv_fetcher, PRICE_COLUMN
+
+DEFAULT_PATH_COUNTS = [1_000, 10_000, 100_000]
+DEFAULT_YEARS = [10, 30]
+DEFAULT_STORE_SIZES = [10, 1_000, 100_000]
+DEFAULT_RESPONSE_SIZES = [10, 1_000, 10_000]
+DEFAULT_REPEATS = 5
+DEFAULT_SEED = 42
+DEFAULT_OUTPUT = "benchmark_results.json"
+DEFAULT_CHUNK_DELAY = 0.002
+
+FIXTURE_TICKERS = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+FIXTURE_START = "2005-01-03"
+FIXTURE_END = "2024-12-31"
+
+
+def write_fixture_prices(directory, tickers=FIXTURE_TICKERS, seed=DEFAULT_SEED):
+    """
+    Write reproducible daily price histories for fixture tickers, readable with `csv_fetcher`.
+
+    Parameters:
+    - directory (str): Directory to write `<ticker>.csv` files to.
+    - tickers (list): Tickers to generate.
+    - seed (int): Random seed of the price paths.
+    """
+    dates = pd.bdate_range(FIXTURE_START, FIXTURE_END)
+    random_state = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    for ticker in tickers:
+        prices = 100 * np.exp(np.cumsum(random_state.normal(0.0003, 0.012, len(dates))))
+        pd.DataFrame({"Date": dates, PRICE_COLUMN: prices}).to_csv(os.path.join(directory, f"{ticker}.csv"), index=False)
+
+
+def fixture_investments(count, tickers=FIXTURE_TICKERS):
+    """
+    Build a portfolio in the format returned by the AI model, with allocations adding up to 100%.
+
+    Parameters:
+    - count (int): Number of investments, at least 3.
+    - tickers (list): Tickers to cycle through for the stocks.
+
+    Returns:
+    - list: The investments, all stocks but one bond and one cash holding.
+    """
+    stocks = count - 2
+    investments = [
+        {"asset_name": f"Stock {i}", "ticker": tickers[i % len(tickers)], "allocation": f"{60 / stocks:.4f}%",
+         "category": "Stock", "rationale": "Diversified exposure to a sustainable business."}
+        for i in range(stocks)
+    ]
+    investments.append({"asset_name": "Green Bond Fund", "ticker": "", "allocation": "30%", "category": "Bond",
+                        "rationale": "Stable income."})
+    investments.append({"asset_name": "Money Market", "ticker": "", "allocation": "10%", "category": "Cash",
+                        "rationale": "Liquidity."})
+    return investments
+
+
+def fixture_user_data(i):
+    """
+    Build a distinct client profile.
+
+    Parameters:
+    - i (int): Index of the client.
+
+    Returns:
+    - dict: The client's details, in the format of the portfolio creation page.
+    """
+    return {"age": 20 + i % 40, "Initial_investment": 1_000 * (i + 1), "monthly_contribution": 500,
+            "retirement_age": 65, "ethical_values": ["Green Energy", "Fair Labor"], "risk_aversion": "Medium"}
+
+
+def time_call(function, repeats, setup=None):
+    """
+    Time repeated calls of a function.
+
+    Parameters:
+    - function (callable): Function without arguments to time.
+    - repeats (int): Number of timed calls.
+    - setup (callable, optional): Function without arguments called before each call, outside the timing.
+
+    Returns:
+    - dict: Minimum, median and mean duration in seconds, and the number of calls.
+    """
+    durations = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return summarize(durations)
+
+
+def summarize(durations):
+    """
+    Summarize durations measured for one benchmark.
+
+    Parameters:
+    - durations (list): Durations in seconds.
+
+    Returns:
+    - dict: Minimum, median and mean duration in seconds, and the number of calls.
+    """
+    return {"repeats": len(durations), "min_s": min(durations), "median_s": statistics.median(durations),
+            "mean_s": statistics.fmean(durations)}
+
+
+def benchmark_simulation(path_counts, years_list, repeats, seed):
+    """
+    Time `monte_carlo_simulation` for every combination of number of paths and horizon.
+
+    Parameters:
+    - path_counts (list): Numbers of paths to simulate.
+    - years_list (list): Horizons in years.
+    - repeats (int): Number of timed calls per combination.
+    - seed (int): Random seed of the simulation.
+
+    Returns:
+    - list: One result per combination.
+    """
+    from simulation import monte_carlo_simulation
+    from return_models import portfolio_allocations
+
+    allocations = portfolio_allocations(validate_investments(fixture_investments(len(FIXTURE_TICKERS) + 2)))
+    # Fill the price and return caches so that only the simulation is timed
+    monte_carlo_simulation(*allocations, 1_000, 500, 1, 10, seed)
+
+    results = []
+    for years in years_list:
+        for simulations in path_counts:
+            timing = time_call(lambda: monte_carlo_simulation(*allocations, 10_000, 500, years, simulations, seed), repeats)
+            results.append({"benchmark": "monte_carlo_simulation", "params": {"simulations": simulations, "years": years}, **timing})
+    return results
+
+
+def benchmark_storage(store_sizes, repeats):
+    """
+    Time saving, loading and looking up portfolios with the store holding each number of portfolios.
+
+    The store is filled in bulk between sizes, so the sizes are reached in increasing order. Misses look up
+    a profile that is never saved, and every timed save stores a profile of its own.
+
+    Parameters:
+    - store_sizes (list): Numbers of stored portfolios.
+    - repeats (int): Number of timed calls per operation and size.
+
+    Returns:
+    - list: One result per operation and size.
+    """
+    from ai_call import save_portfolio, load_all_portfolios, check_existing_portfolio
+    from portfolio_store import portfolio_store
+
+    investments = validate_investments(fixture_investments(12))
+    stored = 0
+    results = []
+    for size in sorted(store_sizes):
+        portfolio_store.add_many([(fixture_user_data(i), investments, f"Client {i}") for i in range(stored, size)])
+        stored = size
+        existing_profile = fixture_user_data(size // 2)
+        missing_profile = dict(fixture_user_data(size), risk_aversion="None")
+        saved_profiles = (dict(fixture_user_data(size + i), risk_aversion="High") for i in itertools.count())
+
+        operations = [
+            ("load_all_portfolios", load_all_portfolios),
+            ("check_existing_portfolio_hit", lambda: check_existing_portfolio(existing_profile)),
+            ("check_existing_portfolio_miss", lambda: check_existing_portfolio(missing_profile)),
+        ]
+        # Cold calls query and decode the database, warm calls are served by the store's result cache
+        for name, operation in operations:
+            cold = time_call(operation, repeats, setup=portfolio_store.clear_cache)
+            results.append({"benchmark": name, "params": {"stored_portfolios": size}, **cold})
+            operation()
+            warm = time_call(operation, repeats)
+            results.append({"benchmark": f"{name}_warm", "params": {"stored_portfolios": size}, **warm})
+        save = time_call(lambda: save_portfolio(next(saved_profiles), investments, "Benchmark"), repeats)
+        results.append({"benchmark": "save_portfolio", "params": {"stored_portfolios": size}, **save})
+        stored += repeats
+    return results
+
+
+def benchmark_parsing(response_sizes, repeats):
+    """
+    Time `parse_investments` on AI responses with each number of investments.
+
+    Parameters:
+    - response_sizes (list): Numbers of investments per response.
+    - repeats (int): Number of timed calls per size.
+
+    Returns:
+    - list: One result per size.
+    """
+    from ai_call import parse_investments
+
+    results = []
+    for size in response_sizes:
+        response = json.dumps(fixture_investments(size), indent=2)
+        timing = time_call(lambda: parse_investments(response), repeats)
+        results.append({"benchmark": "parse_investments", "params": {"investments": size, "response_bytes": len(response)}, **timing})
+    return results
+
+
+def benchmark_streaming(repeats, chunk_delay):
+    """
+    Time a blocking portfolio request against the time to first holding and to the full streamed response.
+
+    Requests go to a local fake Groq server streaming a fixed portfolio, with responses never cached.
+
+    Parameters:
+    - repeats (int): Number of timed requests of each kind.
+    - chunk_delay (float): Seconds between streamed chunks, standing in for the generation speed of the model.
+
+    Returns:
+    - list: Results for the blocking request, the first streamed holding and the full streamed response.
+    """
+    from groq import Groq
+    from ai_call import get_portfolio, stream_portfolio
+    from fake_groq_server import start_fake_server
+
+    server = start_fake_server(chunk_delay=chunk_delay)
+    try:
+        ai_client = Groq(api_key="benchmark", base_url=f"http://127.0.0.1:{server.server_port}")
+        params = {"chunk_delay_s": chunk_delay}
+        blocking = time_call(lambda: get_portfolio(fixture_user_data(0), ai_client=ai_client, cache=None), repeats)
+        first_holding, full_response = [], []
+        for _ in range(repeats):
+            stream = stream_portfolio(fixture_user_data(0), ai_client=ai_client, cache=None)
+            for _ in stream:
+                pass
+            first_holding.append(stream.time_to_first_holding)
+            full_response.append(stream.elapsed)
+    finally:
+        server.shutdown()
+    return [
+        {"benchmark": "get_portfolio", "params": params, **blocking},
+        {"benchmark": "stream_portfolio_first_holding", "params": params, **summarize(first_holding)},
+        {"benchmark": "stream_portfolio_full", "params": params, **summarize(full_response)},
+    ]
+
+
+def environment():
+    """
+    Describe the environment of a benchmark run.
+
+    Returns:
+    - dict: The time of the run, the git commit if available, and the Python and library versions.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare_results(baseline, current):
+    """
+    Print the change in median duration of every benchmark found in both runs.
+
+    Parameters:
+    - baseline (dict): Results of the earlier run, as written by `main`.
+    - current (dict): Results of the new run.
+    """
+    def key(result):
+        return result["benchmark"], json.dumps(result["params"], sort_keys=True)
+
+    baseline_results = {key(result): result for result in baseline["results"]}
+    for result in current["results"]:
+        previous = baseline_results.get(key(result))
+        if previous is None:
+            continue
+        ratio = result["median_s"] / previous["median_s"]
+        print(f"{result['benchmark']:32} {key(result)[1]:48} {previous['median_s'] * 1000:10.2f} ms -> "
+              f"{result['median_s'] * 1000:10.2f} ms ({ratio:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation, storage, AI response parsing and streaming hot paths.")
+    parser.add_argument("--paths", type=int, nargs="+", default=DEFAULT_PATH_COUNTS, help="numbers of simulated paths")
+    parser.add_argument("--years", type=int, nargs="+", default=DEFAULT_YEARS, help="simulation horizons in years")
+    parser.add_argument("--store-sizes", type=int, nargs="+", default=DEFAULT_STORE_SIZES, help="numbers of stored portfolios")
+    parser.add_argument("--response-sizes", type=int, nargs="+", default=DEFAULT_RESPONSE_SIZES, help="numbers of investments per AI response")
+    parser.add_argument("--chunk-delay", type=float, default=DEFAULT_CHUNK_DELAY,
+                        help="seconds between chunks streamed by the fake AI server")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="timed calls per benchmark")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="random seed")
+    parser.add_argument("--fixtures", default=None, help="directory of <ticker>.csv price fixtures, generated if omitted")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON file to write the results to")
+    parser.add_argument("--compare", default=None, help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+    original_dir = os.getcwd()
+
+    # Every store uses paths relative to the working directory, so the run never touches local data
+    with tempfile.TemporaryDirectory() as work_dir:
+        fixtures = os.path.abspath(args.fixtures) if args.fixtures else os.path.join(work_dir, "fixtures")
+        if not args.fixtures:
+            write_fixture_prices(fixtures, seed=args.seed)
+        os.chdir(work_dir)
+        price_store.fetcher = csv_fetcher(fixtures)
+        try:
+            results = (benchmark_simulation(args.paths, args.years, args.repeats, args.seed)
+                       + benchmark_storage(args.store_sizes, args.repeats)
+                       + benchmark_parsing(args.response_sizes, args.repeats)
+                       + benchmark_streaming(args.repeats, args.chunk_delay))
+        finally:
+            os.chdir(original_dir)
+
+    run = {"environment": environment(), "results": results}
+    with open(args.output, "w") as file:
+        json.dump(run, file, indent=2)
+    for result in results:
+        print(f"{result['benchmark']:32} {json.dumps(result['params']):48} {result['median_s'] * 1000:10.2f} ms")
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare_results(json.load(file), run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import asyncio
+import csv
+import random
+import time
+from groq import RateLimitError
+from ai_call import get_portfolio, parse_investments, save_portfolio, check_existing_portfolio
+from portfolio_store import profile_fingerprint
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 1.0
+
+
+def read_profiles(csv_path):
+    """
+    Read client profiles from a CSV file.
+
+    The file needs the columns `portfolio_name`, `age`, `Initial_investment`, `monthly_contribution`,
+    `retirement_age`, `ethical_values` and `risk_aversion`. Rows are returned as read, convert them with
+    `parse_profile`, so that a malformed row only fails its own portfolio.
+
+    Parameters:
+    - csv_path (str): Path to the CSV file.
+
+    Returns:
+    - generator: Tuples of (portfolio_name, row), with row a dictionary of the CSV columns.
+    """
+    with open(csv_path, newline="") as file:
+        for row in csv.DictReader(file):
+            yield row.get("portfolio_name") or "", row
+
+
+def parse_profile(row):
+    """
+    Convert a CSV row to user data. Ethical values are separated by semicolons.
+
+    Parameters:
+    - row (dict): A row returned by `read_profiles`.
+
+    Returns:
+    - dict: The user data in the format used by `get_portfolio`.
+
+    Raises:
+    - ValueError: If a column is missing or a number cannot be parsed.
+    """
+    try:
+        return {
+            "age": int(row["age"]),
+            "Initial_investment": int(row["Initial_investment"]),
+            "monthly_contribution": int(row["monthly_contribution"]),
+            "retirement_age": int(row["retirement_age"]),
+            "ethical_values": [value.strip() for value in (row["ethical_values"] or "").split(";") if value.strip()],
+            "risk_aversion": row["risk_aversion"],
+        }
+    except KeyError as e:
+        raise ValueError(f"missing column {e}") from None
+    except TypeError:
+        raise ValueError("row has fewer columns than the header") from None
+
+
+async def _generate_one(portfolio_name, user_data, semaphore, max_retries, base_delay, ai_client):
+    async with semaphore:
+        if await asyncio.to_thread(check_existing_portfolio, user_data):
+            return "existing"
+
+        for attempt in range(max_retries + 1):
+            try:
+                ai_response = await asyncio.to_thread(get_portfolio, user_data, ai_client)
+                break
+            except RateLimitError:
+                if attempt == max_retries:
+                    raise
+                # Exponential backoff with jitter so the workers do not retry in lockstep
+                await asyncio.sleep(base_delay * 2 ** attempt * (1 + random.random()))
+
+        investments = parse_investments(ai_response) if ai_response else None
+        if not investments:
+            return "failed"
+        await asyncio.to_thread(save_portfolio, user_data, investments, portfolio_name)
+        return "created"
+
+
+async def generate_portfolios(profiles, concurrency=DEFAULT_CONCURRENCY, max_retries=DEFAULT_MAX_RETRIES,
+                              base_delay=DEFAULT_BASE_DELAY, ai_client=None, on_result=None, parse=None):
+    """
+    Generate and save portfolios for many client profiles with bounded concurrency.
+
+    Each portfolio is saved as soon as it is parsed. Profiles that already have a portfolio are skipped,
+    and rate-limited requests are retried with exponential backoff. A profile that cannot be parsed fails
+    on its own, and a profile equivalent to an earlier one of the batch, see `profile_fingerprint`, is
+    counted as existing instead of being generated and saved a second time.
+
+    Parameters:
+    - profiles (iterable): Tuples of (portfolio_name, user_data), or of (portfolio_name, row) with `parse`.
+    - concurrency (int): Maximum number of profiles processed at once.
+    - max_retries (int): Maximum number of retries of a rate-limited request.
+    - base_delay (float): Delay in seconds before the first retry, doubled on every retry.
+    - ai_client (Groq, optional): The client used to call the model.
+    - on_result (callable, optional): Called with (portfolio_name, status) as each profile completes.
+    - parse (callable, optional): Function converting each profile to user data, e.g. `parse_profile`.
+
+    Returns:
+    - dict: The number of 'created', 'existing' and 'failed' portfolios, the 'elapsed' time in seconds
+      and the 'throughput' in portfolios per minute.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    summary = {"created": 0, "existing": 0, "failed": 0}
+    start = time.perf_counter()
+
+    def report(portfolio_name, status):
+        summary[status] += 1
+        if on_result is not None:
+            on_result(portfolio_name, status)
+
+    async def run(portfolio_name, user_data):
+        try:
+            status = await _generate_one(portfolio_name, user_data, semaphore, max_retries, base_delay, ai_client)
+        except Exception as e:
+            print(f"Error generating portfolio '{portfolio_name}': {e}")
+            status = "failed"
+        report(portfolio_name, status)
+
+    tasks = []
+    fingerprints = set()
+    for portfolio_name, profile in profiles:
+        try:
+            user_data = parse(profile) if parse is not None else profile
+            fingerprint = profile_fingerprint(user_data)
+        except (ValueError, TypeError) as e:
+            print(f"Error reading the profile of portfolio '{portfolio_name}': {e}")
+            report(portfolio_name, "failed")
+            continue
+        if fingerprint in fingerprints:
+            report(portfolio_name, "existing")
+            continue
+        fingerprints.add(fingerprint)
+        tasks.append(run(portfolio_name, user_data))
+    await asyncio.gather(*tasks)
+
+    summary["elapsed"] = time.perf_counter() - start
+    completed = summary["created"] + summary["existing"] + summary["failed"]
+    summary["throughput"] = completed / summary["elapsed"] * 60 if summary["elapsed"] > 0 else 0.0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate portfolios for a batch of clients from a CSV file.")
+    parser.add_argument("csv_path", help="CSV file with one client profile per row")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="maximum number of concurrent AI calls")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES, help="retries of a rate-limited call")
+    args = parser.parse_args()
+
+    summary = asyncio.run(generate_portfolios(
+        read_profiles(args.csv_path),
+        concurrency=args.concurrency,
+        max_retries=args.max_retries,
+        parse=parse_profile,
+        on_result=lambda portfolio_name, status: print(f"{portfolio_name}: {status}")
+    ))
+    print(
+        f"Created {summary['created']}, existing {summary['existing']}, failed {summary['failed']} "
+        f"in {summary['elapsed']:.1f}s ({summary['throughput']:.1f} portfolios/min)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import numpy as np
+
+DEFAULT_ANNUAL_INFLATION = 0.025
+DEFAULT_WITHDRAWAL_RATE = 0.04
+DEFAULT_GUARDRAIL = 0.2
+DEFAULT_ADJUSTMENT = 0.1
+
+# Withdrawal rules selectable on the simulation page, by display name
+WITHDRAWAL_RULES = {
+    "Fixed Real Amount": "fixed_real",
+    "Percentage of Balance": "percentage",
+    "Guardrails": "guardrails",
+}
+
+
+def retirement_returns(paths, retirement_months, withdrawal_months):
+    """
+    Extract the monthly portfolio returns that follow retirement from cached sampled paths.
+
+    For models that compound every holding separately, the returns are those of the portfolio as a whole,
+    which treats withdrawals as taken from every holding in proportion.
+
+    Parameters:
+    - paths (PathCache): The sampled return paths.
+    - retirement_months (int): Number of months until retirement.
+    - withdrawal_months (int): Number of months in retirement.
+
+    Returns:
+    - numpy.ndarray: Monthly returns of shape (paths, withdrawal_months).
+    """
+    paths.extend(retirement_months + withdrawal_months)
+    growth = paths.growth[:, retirement_months:retirement_months + withdrawal_months + 1]
+    return growth[:, 1:] / growth[:, :-1] - 1
+
+
+def simulate_withdrawals(start_balances, returns, rule, monthly_withdrawal=0.0, withdrawal_rate=DEFAULT_WITHDRAWAL_RATE,
+                         annual_inflation=DEFAULT_ANNUAL_INFLATION, guardrail=DEFAULT_GUARDRAIL,
+                         adjustment=DEFAULT_ADJUSTMENT):
+    """
+    Simulate the withdrawal phase of every path, one month at a time across all paths at once.
+
+    Withdrawals are taken at the start of each month, before that month's return. The rules are:
+    - 'fixed_real': `monthly_withdrawal`, raised every month with inflation.
+    - 'percentage': `withdrawal_rate` of the current balance per year, paid monthly. It never runs out, but
+      the income follows the markets.
+    - 'guardrails': starts like 'fixed_real'. Once a year, the withdrawal is cut by `adjustment` if it has
+      grown to more than `1 + guardrail` times its initial share of the balance, and raised by
+      `adjustment` if it has fallen below `1 - guardrail` times that share.
+
+    Parameters:
+    - start_balances (numpy.ndarray): Portfolio value of each path at retirement.
+    - returns (numpy.ndarray): Monthly returns after retirement, shape (paths, months).
+    - rule (str): The withdrawal rule, one of the values of `WITHDRAWAL_RULES`.
+    - monthly_withdrawal (float): First monthly withdrawal of the 'fixed_real' and 'guardrails' rules.
+    - withdrawal_rate (float): Yearly withdrawal rate of the 'percentage' rule.
+    - annual_inflation (float): Yearly inflation used to index withdrawals.
+    - guardrail (float): Relative band around the initial withdrawal rate of the 'guardrails' rule.
+    - adjustment (float): Relative cut or raise applied when a guardrail is crossed.
+
+    Returns:
+    - balances (numpy.ndarray): Balances of shape (paths, months + 1).
+    - withdrawals (numpy.ndarray): Amounts actually withdrawn, shape (paths, months).
+    - ruined (numpy.ndarray): Whether each path ran out of money before paying every planned withdrawal.
+    """
+    paths, months = returns.shape
+    monthly_inflation = (1 + annual_inflation) ** (1 / 12) - 1
+    balances = np.empty((paths, months + 1))
+    withdrawals = np.empty((paths, months))
+    balances[:, 0] = start_balances
+    ruined = np.zeros(paths, dtype=bool)
+
+    planned = np.full(paths, float(monthly_withdrawal))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        initial_rate = np.where(start_balances > 0, planned / start_balances, np.inf)
+
+    for month in range(months):
+        balance = balances[:, month]
+        if rule == "percentage":
+            planned = balance * withdrawal_rate / 12
+        elif month > 0:
+            planned = planned * (1 + monthly_inflation)
+            if rule == "guardrails" and month % 12 == 0:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    current_rate = np.where(balance > 0, planned / balance, np.inf)
+                planned = np.where(current_rate > initial_rate * (1 + guardrail), planned * (1 - adjustment), planned)
+                planned = np.where(current_rate < initial_rate * (1 - guardrail), planned * (1 + adjustment), planned)
+
+        ruined |= planned > balance
+        withdrawals[:, month] = np.minimum(planned, balance)
+        balances[:, month + 1] = (balance - withdrawals[:, month]) * (1 + returns[:, month])
+
+    return balances, withdrawals, ruined
+
+
+def sustainable_withdrawals(start_balances, returns, percentiles=(5, 50), annual_inflation=DEFAULT_ANNUAL_INFLATION):
+    """
+    Compute the largest inflation-indexed monthly withdrawal each path can sustain, and its percentiles.
+
+    With a first withdrawal `W` raised by inflation every month, a path pays every withdrawal exactly when
+    `W <= start_balance / sum_k((1 + inflation) ** k / growth[k])`, where `growth[k]` is the growth of the
+    portfolio over the first k months of retirement. This is evaluated for every path at once.
+
+    Parameters:
+    - start_balances (numpy.ndarray): Portfolio value of each path at retirement.
+    - returns (numpy.ndarray): Monthly returns after retirement, shape (paths, months).
+    - percentiles (tuple): Percentiles of the sustainable withdrawal to return. The 5th percentile is the
+      withdrawal sustained in 95% of the scenarios.
+    - annual_inflation (float): Yearly inflation used to index withdrawals.
+
+    Returns:
+    - numpy.ndarray: The sustainable first monthly withdrawal at each percentile.
+    """
+    paths, months = returns.shape
+    monthly_inflation = (1 + annual_inflation) ** (1 / 12) - 1
+    growth = np.ones((paths, months))
+    np.cumprod(1 + returns[:, :-1], axis=1, out=growth[:, 1:])
+    discount = ((1 + monthly_inflation) ** np.arange(months) / growth).sum(axis=1)
+    return np.percentile(np.maximum(start_balances, 0) / discount, percentiles)
@@ -0,0 +1,179 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8765
+DEFAULT_CHUNK_SIZE = 4
+DEFAULT_CHUNK_DELAY = 0.01
+
+PORTFOLIO = [
+    {"asset_name": "Apple Inc.", "ticker": "AAPL", "allocation": "15%", "category": "Stock",
+     "rationale": "Large, profitable technology company with a strong balance sheet."},
+    {"asset_name": "Microsoft Corporation", "ticker": "MSFT", "allocation": "15%", "category": "Stock",
+     "rationale": "Diversified software and cloud revenue with a commitment to renewable energy."},
+    {"asset_name": "NextEra Energy", "ticker": "NEE", "allocation": "10%", "category": "Stock",
+     "rationale": "Leading producer of wind and solar energy."},
+    {"asset_name": "Johnson & Johnson", "ticker": "JNJ", "allocation": "10%", "category": "Stock",
+     "rationale": "Defensive healthcare exposure with a long dividend history."},
+    {"asset_name": "US Treasury Bonds", "ticker": "", "allocation": "25%", "category": "Bond",
+     "rationale": "Low risk income that balances the volatility of the stocks."},
+    {"asset_name": "Green Bonds", "ticker": "", "allocation": "15%", "category": "Bond",
+     "rationale": "Fixed income financing environmental projects."},
+    {"asset_name": "High-Yield Savings Account", "ticker": "", "allocation": "10%", "category": "Cash",
+     "rationale": "Liquidity for emergencies and rebalancing."},
+]
+
+
+def split_response(text, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Split a response into chunks of a few characters, roughly the size of the tokens streamed by the model.
+
+    Parameters:
+    - text (str): The full response.
+    - chunk_size (int): Number of characters per chunk.
+
+    Returns:
+    - list: The chunks, in order.
+    """
+    return [text[start:start + chunk_size] for start in range(0, len(text), chunk_size)]
+
+
+def _completion_chunk(completion_id, created, model, content, finish_reason=None):
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish_reason}],
+        "x_groq": {"id": completion_id},
+    }
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    """
+    Answers chat completion requests with a fixed portfolio, streamed when the request asks for it.
+
+    The response text, the delay between chunks and the number of requests to reject with a rate limit
+    error come from the server, see `start_fake_server`.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_rate_limit_error(self):
+        body = json.dumps({"error": {"message": "Rate limit reached for requests", "type": "requests",
+                                     "code": "rate_limit_exceeded"}}).encode("utf-8")
+        self.send_response(429)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/openai/v1/chat/completions":
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.server.lock:
+            self.server.requests += 1
+            rate_limited = self.server.rate_limited > 0
+            if rate_limited:
+                self.server.rate_limited -= 1
+        if rate_limited:
+            self._send_rate_limit_error()
+            return
+
+        model = request.get("model", "fake-model")
+        completion_id = f"chatcmpl-fake-{time.monotonic_ns()}"
+        created = int(time.time())
+        response = self.server.response
+
+        if not request.get("stream"):
+            time.sleep(self.server.chunk_delay * len(split_response(response, self.server.chunk_size)))
+            body = json.dumps({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": response},
+                             "logprobs": None, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        events = [_completion_chunk(completion_id, created, model, "")]
+        events += [_completion_chunk(completion_id, created, model, chunk)
+                   for chunk in split_response(response, self.server.chunk_size)]
+        events.append(_completion_chunk(completion_id, created, model, None, finish_reason="stop"))
+        for event in events:
+            time.sleep(self.server.chunk_delay)
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def start_fake_server(port=0, response=None, chunk_size=DEFAULT_CHUNK_SIZE, chunk_delay=DEFAULT_CHUNK_DELAY, rate_limited=0):
+    """
+    Start a local server imitating the Groq chat completion API in a background thread.
+
+    Point the app or a Groq client at it with `GROQ_BASE_URL=http://127.0.0.1:<port>` or `Groq(base_url=...)`.
+
+    Parameters:
+    - port (int): Port to listen on, 0 for any free port.
+    - response (str): Text of every completion, defaults to a fixed portfolio.
+    - chunk_size (int): Number of characters per streamed chunk.
+    - chunk_delay (float): Seconds to wait before each chunk, to imitate the generation speed of the model.
+    - rate_limited (int): Number of upcoming requests answered with a 429 rate limit error.
+
+    Returns:
+    - ThreadingHTTPServer: The running server, its URL is `f"http://127.0.0.1:{server.server_port}"`.
+      Its `requests` attribute counts the requests received. Call `shutdown()` to stop it.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeGroqHandler)
+    server.daemon_threads = True
+    server.response = response if response is not None else json.dumps(PORTFOLIO, indent=2)
+    server.chunk_size = chunk_size
+    server.chunk_delay = chunk_delay
+    server.rate_limited = rate_limited
+    server.requests = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Groq chat completion API that streams a fixed portfolio.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="characters per streamed chunk")
+    parser.add_argument("--chunk-delay", type=float, default=DEFAULT_CHUNK_DELAY, help="seconds between chunks")
+    parser.add_argument("--rate-limited", type=int, default=0, help="number of first requests answered with a 429 error")
+    args = parser.parse_args()
+
+    server = start_fake_server(args.port, chunk_size=args.chunk_size, chunk_delay=args.chunk_delay,
+                               rate_limited=args.rate_limited)
+    print(f"Serving fake Groq API on http://127.0.0.1:{server.server_port}, press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def required_contribution(paths, initial_deposit, months, target, confidence):
+    """
+    Solve for the smallest monthly contribution that reaches a target value with a given confidence.
+
+    The final value of each path is `initial_deposit * growth + contribution * contribution_growth`, so each
+    path reaches the target exactly when the contribution is at least
+    `(target - initial_deposit * growth) / contribution_growth`. The answer is the `confidence` quantile of
+    these per-path thresholds, found with a single pass over the paths.
+
+    Parameters:
+    - paths (PathCache): The sampled return paths.
+    - initial_deposit (float): Initial deposit amount.
+    - months (int): Number of months until retirement, at least 1.
+    - target (float): Target portfolio value at retirement.
+    - confidence (float): Required share of paths reaching the target, between 0 and 1.
+
+    Returns:
+    - float: The required monthly contribution, 0 if the initial deposit alone is enough.
+    """
+    paths.extend(months)
+    growth = paths.growth[:, months]
+    contribution_growth = paths.contribution_growth[:, months]
+    thresholds = (target - initial_deposit * growth) / contribution_growth
+
+    # Smallest contribution for which at least ceil(confidence * paths) paths reach the target
+    rank = min(max(int(np.ceil(confidence * len(thresholds))), 1), len(thresholds))
+    return max(float(np.partition(thresholds, rank - 1)[rank - 1]), 0.0)
+
+
+def required_months(paths, initial_deposit, monthly_contribution, target, confidence, max_months, step=12):
+    """
+    Solve for the shortest horizon that reaches a target value with a given confidence.
+
+    The success probability of every candidate horizon is computed in one vectorized pass over the paths.
+
+    Parameters:
+    - paths (PathCache): The sampled return paths.
+    - initial_deposit (float): Initial deposit amount.
+    - monthly_contribution (float): Monthly contribution amount.
+    - target (float): Target portfolio value at retirement.
+    - confidence (float): Required share of paths reaching the target, between 0 and 1.
+    - max_months (int): Longest horizon considered.
+    - step (int): Spacing in months between candidate horizons.
+
+    Returns:
+    - int or None: The required number of months, None if the target is not reached within `max_months`.
+    """
+    paths.extend(max_months)
+    horizons = np.arange(step, max_months + 1, step)
+    values = initial_deposit * paths.growth[:, horizons] + monthly_contribution * paths.contribution_growth[:, horizons]
+    probabilities = np.mean(values >= target, axis=0)
+    reached = np.flatnonzero(probabilities >= confidence)
+    return int(horizons[reached[0]]) if len(reached) else None
@@ -0,0 +1,141 @@
+import math
+from enum import Enum
+from pydantic import BaseModel, TypeAdapter, field_validator, model_validator
+
+
+class Category(str, Enum):
+    STOCK = "Stock"
+    BOND = "Bond"
+    CASH = "Cash"
+
+
+_CATEGORY_ALIASES = {
+    "stock": Category.STOCK, "stocks": Category.STOCK, "equity": Category.STOCK, "equities": Category.STOCK,
+    "bond": Category.BOND, "bonds": Category.BOND, "fixed income": Category.BOND,
+    "cash": Category.CASH, "money market": Category.CASH,
+}
+
+# Allocations must add up to 100% within this many percentage points to be rescaled
+ALLOCATION_TOLERANCE = 5.0
+
+
+class Investment(BaseModel):
+    """
+    Schema of one investment returned by the AI model.
+
+    Attributes:
+    - asset_name (str): Name of the asset.
+    - ticker (str): Upper case Yahoo Finance ticker for stocks, empty for bonds and cash.
+    - category (Category): Asset class of the investment.
+    - allocation (float): Allocation in percent, e.g. 12.5 for "12.5%".
+    - rationale (str): Reason for choosing the asset.
+    """
+
+    asset_name: str
+    ticker: str = ""
+    category: Category
+    allocation: float
+    rationale: str = ""
+
+    @model_validator(mode="before")
+    @classmethod
+    def _accept_weight(cls, data):
+        # Normalized investments carry a weight instead of the allocation string
+        if isinstance(data, dict) and "allocation" not in data and isinstance(data.get("weight"), (int, float)):
+            data = dict(data, allocation=data["weight"] * 100)
+        return data
+
+    @field_validator("ticker", mode="before")
+    @classmethod
+    def _normalize_ticker(cls, ticker):
+        return (ticker or "").strip().lstrip("$").upper()
+
+    @field_validator("category", mode="before")
+    @classmethod
+    def _normalize_category(cls, category):
+        if isinstance(category, str):
+            return _CATEGORY_ALIASES.get(category.strip().lower(), category)
+        return category
+
+    @field_validator("allocation", mode="before")
+    @classmethod
+    def _parse_allocation(cls, allocation):
+        if isinstance(allocation, str):
+            return allocation.strip().rstrip("%").strip()
+        return allocation
+
+    @field_validator("allocation")
+    @classmethod
+    def _check_allocation(cls, allocation):
+        if not (math.isfinite(allocation) and allocation >= 0):
+            raise ValueError("allocation must be a non-negative number")
+        return allocation
+
+    @model_validator(mode="after")
+    def _check_ticker(self):
+        if self.category is Category.STOCK and not self.ticker:
+            raise ValueError(f"stock '{self.asset_name}' has no ticker")
+        if self.category is not Category.STOCK:
+            self.ticker = ""
+        return self
+
+
+_investment_list = TypeAdapter(list[Investment])
+
+
+def validate_investments(data):
+    """
+    Validate investments returned by the AI model and convert them to their normalized form.
+
+    A response wrapped in an object with a single list, e.g. `{"portfolio": [...]}`, is unwrapped.
+    Allocations adding up to 100% within `ALLOCATION_TOLERANCE` percentage points, e.g. 99% or 101%, are
+    rescaled to weights adding up to 1. Totals further off are rejected rather than silently rescaled.
+
+    Parameters:
+    - data (list or dict): The decoded AI response, or investments already normalized.
+
+    Returns:
+    - list: One dictionary per investment with its 'asset_name', 'ticker', 'category' ('Stock', 'Bond'
+      or 'Cash'), 'weight' (between 0 and 1) and 'rationale'.
+
+    Raises:
+    - ValueError: If the investments do not match the schema or their allocations do not add up to 100%.
+    """
+    if isinstance(data, dict):
+        lists = [value for value in data.values() if isinstance(value, list)]
+        if len(lists) != 1:
+            raise ValueError("expected a list of investments")
+        data = lists[0]
+
+    investments = _investment_list.validate_python(data)
+    total = sum(investment.allocation for investment in investments)
+    if not abs(total - 100) <= ALLOCATION_TOLERANCE:
+        raise ValueError(f"allocations add up to {total:g}%, expected {100 - ALLOCATION_TOLERANCE:g}% to "
+                         f"{100 + ALLOCATION_TOLERANCE:g}%")
+
+    return [
+        {
+            "asset_name": investment.asset_name,
+            "ticker": investment.ticker,
+            "category": investment.category.value,
+            "weight": investment.allocation / total,
+            "rationale": investment.rationale,
+        }
+        for investment in investments
+    ]
+
+
+def category_totals(investments):
+    """
+    Add up the weights of normalized investments per category.
+
+    Parameters:
+    - investments (list): Normalized investments, see `validate_investments`.
+
+    Returns:
+    - dict: Total weight of each category present, in order of first appearance.
+    """
+    totals = {}
+    for investment in investments:
+        totals[investment["category"]] = totals.get(investment["category"], 0.0) + investment["weight"]
+    return totals
@@ -0,0 +1,78 @@
+import json
+
+
+class JsonArrayStream:
+    """
+    Incremental parser for a JSON array of objects arriving in chunks, e.g. from a streamed completion.
+
+    Text before the first `[` is skipped, so a response wrapped in an object like `{"portfolio": [...]}`
+    or in a Markdown code fence still yields its items. Each chunk is scanned once, and every object
+    of the array is decoded as soon as its closing brace arrives.
+
+    Attributes:
+    - text (str): Every chunk received so far.
+    - items (list): Objects decoded so far.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.items = []
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+        self._done = False
+
+    def feed(self, chunk):
+        """
+        Add a chunk of text and decode the objects it completes.
+
+        Parameters:
+        - chunk (str): The next part of the response.
+
+        Returns:
+        - list: The objects completed by this chunk, in order.
+
+        Raises:
+        - json.JSONDecodeError: If a completed object is not valid JSON.
+        """
+        self.text += chunk
+        completed = []
+        text = self.text
+        for position in range(self._position, len(text)):
+            if self._done:
+                break
+            character = text[position]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif character == "\\":
+                    self._escaped = True
+                elif character == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 0:
+                # Skip everything before the array starts
+                if character == "[":
+                    self._depth = 1
+                continue
+
+            if character == '"':
+                self._in_string = True
+            elif character in "{[":
+                if self._depth == 1 and character == "{":
+                    self._item_start = position
+                self._depth += 1
+            elif character in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._item_start is not None:
+                    completed.append(json.loads(text[self._item_start:position + 1]))
+                    self._item_start = None
+                elif self._depth == 0:
+                    self._done = True
+        self._position = len(text)
+        self.items.extend(completed)
+        return completed
@@ -1,8 +1,31 @@
+import importlib
 import streamlit as st
-from home_page import introduction_page
-from portfolio_creation import portfolio_creation_page
-from portfolio import portfolio_page
-from simulation import simulation_page
+import timing
+
+# Page label -> (module, render function). A page's module, and the heavy libraries it imports,
+# are only loaded the first time the page is selected.
+PAGES = {
+    "🏡 Home": ("home_page", "introduction_page"),
+    "🛠️ Portfolio Creation": ("portfolio_creation", "portfolio_creation_page"),
+    "📊 Portfolio": ("portfolio", "portfolio_page"),
+    "📈 Simulation": ("simulation", "simulation_page"),
+}
+
+def load_page(page):
+    """
+    Import the module of a page and return its render function.
+
+    Parameters:
+    - page (str): The label of the page, a key of `PAGES`.
+
+    Returns:
+    - callable: The function rendering the page.
+    """
+    module_name, function_name = PAGES[page]
+    with timing.span("page.import", module=module_name):
+        return getattr(importlib.import_module(module_name), function_name)
+
+timing.start_run()
 
 # Sidebar for navigation
 st.sidebar.markdown(
@@ -17,15 +40,12 @@ st.sidebar.markdown(
 # Sidebar for navigation
 page = st.sidebar.selectbox(
     " ",
-    ("🏡 Home", "🛠️ Portfolio Creation", "📊 Portfolio", "📈 Simulation")
+    tuple(PAGES)
 )
 
 # Render selected page
-if page == "🏡 Home":
-    introduction_page()
-elif page == "🛠️ Portfolio Creation":
-    portfolio_creation_page()
-elif page == "📊 Portfolio":
-    portfolio_page()
-elif page == "📈 Simulation":
-    simulation_page()
+load_page(page)()
+
+# Stage-by-stage timings of this rerun, shown when RETIREWISE_TIMING is set
+if timing.enabled:
+    timing.render_panel()
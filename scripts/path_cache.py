@@ -0,0 +1,134 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from simulation_engine import growth_factors, compound_holdings
+
+# Number of months sampled per segment, each segment has its own random stream
+SEGMENT_MONTHS = 12
+
+DEFAULT_MAX_CACHES = 8
+
+
+class PathCache:
+    """
+    Cached growth factors of a fixed set of sampled return paths.
+
+    For fixed return paths, the portfolio value is linear in the initial deposit and the monthly
+    contribution, so projections for new cash flows only cost `paths x months` arithmetic on the cached
+    growth factors. The paths are sampled in segments of `SEGMENT_MONTHS` months, each drawn from its own
+    child of the seed, so extending the horizon appends segments to the cached paths and gives the same
+    paths as sampling the longer horizon from scratch.
+
+    Attributes:
+    - simulations (int): Number of paths.
+    - months (int): Number of months currently sampled.
+    - growth (numpy.ndarray): Growth of one dollar invested at month 0, shape (simulations, months + 1).
+    - contribution_growth (numpy.ndarray): Value of one dollar contributed every month, same shape.
+    """
+
+    def __init__(self, sampler, simulations, seed=None, asset_weights=None):
+        """
+        Parameters:
+        - sampler (callable): Function `(random_state, simulations, months)` returning monthly portfolio
+          returns of shape (simulations, months), or asset returns of shape (simulations, months, assets).
+        - simulations (int): Number of paths.
+        - seed (int, optional): Random seed for reproducibility.
+        - asset_weights (array-like, optional): Initial allocation to each asset when the sampler returns
+          asset returns. Each holding is then compounded separately without rebalancing.
+        """
+        self.sampler = sampler
+        self.simulations = simulations
+        self.asset_weights = None if asset_weights is None else np.asarray(asset_weights, dtype=float)
+        self._seed_sequence = np.random.SeedSequence(seed)
+        self._lock = threading.Lock()
+
+        self.months = 0
+        self.growth = np.ones((simulations, 1))
+        self.contribution_growth = np.zeros((simulations, 1))
+        # State at the last sampled month needed to extend the paths: the growth factors of the portfolio, or
+        # the value of every holding for one dollar deposited and for one dollar contributed every month
+        if self.asset_weights is None:
+            self._last_growth = np.ones(simulations)
+            self._last_contribution_growth = np.zeros(simulations)
+        else:
+            self._last_growth = np.tile(self.asset_weights, (simulations, 1))
+            self._last_contribution_growth = np.zeros((simulations, len(self.asset_weights)))
+
+    def _sample_segment(self, segment):
+        seed_sequence = np.random.SeedSequence(self._seed_sequence.entropy, spawn_key=(segment,))
+        returns = self.sampler(np.random.default_rng(seed_sequence), self.simulations, SEGMENT_MONTHS)
+        if self.asset_weights is not None:
+            growth = compound_holdings(returns, self._last_growth)
+            contribution_growth = compound_holdings(returns, self._last_contribution_growth, self.asset_weights)
+            return growth, contribution_growth
+
+        segment_growth, segment_contribution_growth = growth_factors(returns)
+        growth = self._last_growth[:, None] * segment_growth[:, 1:]
+        contribution_growth = self._last_contribution_growth[:, None] * segment_growth[:, 1:] + segment_contribution_growth[:, 1:]
+        self._last_growth = growth[:, -1]
+        self._last_contribution_growth = contribution_growth[:, -1]
+        return growth, contribution_growth
+
+    def extend(self, months):
+        """
+        Sample more months if the cached paths are shorter than `months`.
+
+        Parameters:
+        - months (int): Number of months needed.
+        """
+        with self._lock:
+            if months <= self.months:
+                return
+            segments = [self._sample_segment(segment)
+                        for segment in range(self.months // SEGMENT_MONTHS, -(-months // SEGMENT_MONTHS))]
+            self.growth = np.concatenate([self.growth] + [growth for growth, _ in segments], axis=1)
+            self.contribution_growth = np.concatenate(
+                [self.contribution_growth] + [contribution_growth for _, contribution_growth in segments], axis=1
+            )
+            self.months = len(segments) * SEGMENT_MONTHS + self.months
+
+    def values(self, initial_deposit, monthly_contribution, months):
+        """
+        Project portfolio values along the cached paths.
+
+        Parameters:
+        - initial_deposit (float): Initial deposit amount.
+        - monthly_contribution (float): Monthly contribution amount.
+        - months (int): Number of months to project.
+
+        Returns:
+        - numpy.ndarray: Portfolio values of shape (simulations, months + 1).
+        """
+        self.extend(months)
+        growth = self.growth[:, :months + 1]
+        contribution_growth = self.contribution_growth[:, :months + 1]
+        return initial_deposit * growth + monthly_contribution * contribution_growth
+
+
+_path_caches = OrderedDict()
+_path_caches_lock = threading.Lock()
+
+
+def get_path_cache(key, factory, max_caches=DEFAULT_MAX_CACHES):
+    """
+    Return the path cache stored under a key, creating it with `factory` on first use.
+
+    The least recently used caches are dropped beyond `max_caches`.
+
+    Parameters:
+    - key (hashable): Identifies the portfolio, return model, seed and number of paths.
+    - factory (callable): Function without arguments returning a new `PathCache`.
+    - max_caches (int): Maximum number of caches kept in memory.
+
+    Returns:
+    - PathCache: The cached or new path cache.
+    """
+    with _path_caches_lock:
+        cache = _path_caches.get(key)
+        if cache is None:
+            cache = factory()
+            _path_caches[key] = cache
+        _path_caches.move_to_end(key)
+        while len(_path_caches) > max_caches:
+            _path_caches.popitem(last=False)
+        return cache
@@ -1,6 +1,8 @@
 import streamlit as st
 import plotly.express as px
-from ai_call import load_all_portfolios
+from ai_call import load_portfolio_names, load_portfolio
+from investments import category_totals
+from timing import span, timed
 
 def portfolio_page():
     """
@@ -8,7 +10,7 @@ def portfolio_page():
 
     This function displays the portfolio breakdown page, which allows the user to select a portfolio
     to view and provides options for customizing the initial investment and monthly contribution.
-    It calls the `load_all_portfolios` function to load all portfolios and displays a warning message
+    It calls the `load_portfolio_names` function to list the saved portfolios and displays a warning message
     if no portfolios are generated yet.
 
     Returns:
@@ -16,19 +18,18 @@ def portfolio_page():
     """
     st.title("📊 Portfolio Breakdown")
     
-    all_portfolios = load_all_portfolios()
-    if not all_portfolios:
+    portfolio_options = load_portfolio_names()
+    if not portfolio_options:
         st.warning("No portfolios generated yet. Please go to the Portfolio Creation page to generate a portfolio.")
         return
     
     st.sidebar.title("Select a Portfolio to view")
-    portfolio_options = [f"{portfolio['portfolio_name']}" for  portfolio in all_portfolios]
-    selected_portfolio = st.sidebar.selectbox("Select a portfolio to view", portfolio_options)
+    selected_portfolio = st.sidebar.selectbox("Select a portfolio to view", list(portfolio_options), format_func=portfolio_options.get)
     
-    if selected_portfolio:
-        portfolio_index = portfolio_options.index(selected_portfolio)
-        investments = all_portfolios[portfolio_index]['portfolio']
-        user_data = all_portfolios[portfolio_index]['user_data']
+    if selected_portfolio is not None:
+        portfolio = load_portfolio(selected_portfolio)
+        investments = portfolio['portfolio']
+        user_data = portfolio['user_data']
         
         initial_investment = st.sidebar.number_input("Initial Investment", min_value=0, value=user_data['Initial_investment'])
         monthly_contribution = st.sidebar.number_input("Monthly Contribution", min_value=0, value=user_data['monthly_contribution'])
@@ -48,33 +49,28 @@ def display_overall_portfolio(investments, user_data, initial_investment, monthl
     Returns:
     None
     """
-    categories = {}
-    for inv in investments:
-        category = inv['category']
-        allocation = float(inv['allocation'].replace('%', ''))
-        if category in categories:
-            categories[category] += allocation
-        else:
-            categories[category] = allocation
+    categories = category_totals(investments)
 
     category_labels = list(categories.keys())
     category_sizes = list(categories.values())
 
-    fig = px.pie(
-        values=category_sizes,
-        names=category_labels,
-        title='Portfolio Allocation by Category',
-        hole=0.3,
-        height=500
-    )
+    with span("portfolio.render_chart"):
+        fig = px.pie(
+            values=category_sizes,
+            names=category_labels,
+            title='Portfolio Allocation by Category',
+            hole=0.3,
+            height=500
+        )
 
-    st.plotly_chart(fig)
+        st.plotly_chart(fig)
 
     selected_category = st.selectbox("Select a category to view details", category_labels)
     
     if selected_category:
         display_category_details(investments, selected_category, initial_investment, monthly_contribution)
     
+@timed("portfolio.category_details")
 def display_category_details(investments, selected_category, initial_investment, monthly_contribution):
     """
     Displays the details of investments in a selected category.
@@ -96,15 +92,14 @@ def display_category_details(investments, selected_category, initial_investment,
         if inv['category'] == 'Stock':
             st.markdown(f"**Asset Name**: {inv['asset_name']}")
             st.markdown(f"**Ticker**: {inv['ticker'] if inv['ticker'] else 'N/A'}")
-            st.markdown(f"**Allocation**: {inv['allocation']}")
+            st.markdown(f"**Allocation**: {inv['weight']:.1%}")
             st.markdown(f"**Category**: {inv['category']}")
         st.markdown(f"**Rationale**: {inv['rationale']}")
         st.markdown("---")
         
     st.write("#### Investment Breakdown")
     for inv in category_investments:
-        allocation = float(inv['allocation'].replace('%', ''))
-        initial_amount = initial_investment * (allocation / 100)
-        monthly_amount = monthly_contribution * (allocation / 100)
+        initial_amount = initial_investment * inv['weight']
+        monthly_amount = monthly_contribution * inv['weight']
         st.markdown(f"- **{inv['asset_name']} ({inv['category']}):** Initial: \${initial_amount:,.2f}, Monthly: \${monthly_amount:,.2f}")
 
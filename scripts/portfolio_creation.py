@@ -1,5 +1,5 @@
 import streamlit as st
-from ai_call import get_portfolio, parse_investments, save_portfolio, load_all_portfolios, check_existing_portfolio
+from ai_call import stream_portfolio, parse_investments, save_portfolio, load_all_portfolios, check_existing_portfolio
 import plotly.express as px
 
 def portfolio_creation_page():
@@ -9,8 +9,8 @@ def portfolio_creation_page():
     This function displays a form where users can input their portfolio details such as name, age, initial investment,
     monthly contribution, retirement age, ethical values, and risk aversion. Upon submitting the form, the function
     checks if a portfolio with the same user data already exists. If it does, the existing portfolio is displayed.
-    Otherwise, the function calls an AI model to generate a portfolio based on the user data, parses the AI response,
-    and saves the portfolio to a file.
+    Otherwise, the function calls an AI model to generate a portfolio based on the user data, shows each holding as soon
+    as it is streamed, then parses the AI response and saves the portfolio to a file.
 
     Returns:
         None
@@ -65,7 +65,7 @@ def portfolio_creation_page():
                 st.success("A portfolio with the same user data already exists.")
                 st.session_state.portfolio = existing_portfolio
             else:
-                ai_response = get_portfolio(user_data)
+                ai_response = display_streamed_holdings(stream_portfolio(user_data))
 
                 if ai_response:
                     # Parse the AI response
@@ -80,3 +80,27 @@ def portfolio_creation_page():
                         st.error("Failed to parse investment details from the AI response. Please try again.")
                 else:
                     st.error("Failed to generate portfolio. Please try again.")
+
+def display_streamed_holdings(stream):
+    """
+    Displays the holdings of a streamed portfolio as they arrive.
+
+    Parameters:
+    - stream (PortfolioStream): The streamed portfolio, see `ai_call.stream_portfolio`.
+
+    Returns:
+    str or None: The full AI response, or None if the model could not be reached.
+    """
+    st.write("### Generating your portfolio")
+    holdings = st.container()
+    try:
+        with st.spinner("Waiting for the AI model..."):
+            for holding in stream:
+                allocation = holding.get('allocation', '')
+                holdings.markdown(f"- **{holding.get('asset_name', 'Unnamed asset')}** ({holding.get('category', '')}) {allocation}")
+    except Exception as e:
+        print(f"Error streaming AI response: {e}")
+        return None
+    if stream.time_to_first_holding is not None:
+        st.caption(f"First holding after {stream.time_to_first_holding:.1f}s, full portfolio after {stream.elapsed:.1f}s")
+    return stream.text
@@ -0,0 +1,359 @@
+import hashlib
+import json
+import numbers
+import os
+import sqlite3
+import threading
+from ai_cache import ResponseCache
+from investments import validate_investments
+
+DEFAULT_DB_PATH = "portfolios.db"
+LEGACY_JSON_PATH = "portfolios.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS portfolios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    portfolio_name TEXT NOT NULL,
+    user_data TEXT NOT NULL,
+    portfolio TEXT NOT NULL,
+    fingerprint TEXT,
+    valid INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_portfolios_name ON portfolios (portfolio_name);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+FINGERPRINT_INDEX = "CREATE INDEX IF NOT EXISTS idx_portfolios_fingerprint ON portfolios (fingerprint)"
+
+# Maximum number of query results kept in memory, across every version of the database
+DEFAULT_CACHE_SIZE = 1024
+
+
+class FrozenDict(dict):
+    """
+    Read-only dictionary returned by the store, so that sessions sharing a cached portfolio cannot modify it.
+
+    It can still be pickled, e.g. to send a portfolio to a worker process, and serialized to JSON.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("portfolios returned by the store are read-only, copy them to modify them")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _normalize_value(value):
+    if isinstance(value, numbers.Number) and not isinstance(value, bool):
+        value = float(value)
+        return int(value) if value.is_integer() else value
+    return value
+
+
+def profile_fingerprint(user_data):
+    """
+    Compute a canonical fingerprint of a user profile.
+
+    Ethical values are sorted and numbers are normalised, so `30` and `30.0` or the same ethical
+    values in a different order give the same fingerprint.
+
+    Parameters:
+    - user_data (dict): A dictionary containing user data.
+
+    Returns:
+    - str: The hex SHA-256 digest of the canonical profile.
+    """
+    canonical = {key: _normalize_value(value) for key, value in user_data.items()}
+    canonical["ethical_values"] = sorted(user_data.get("ethical_values", []))
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _row_to_portfolio(row):
+    return {
+        "id": row[0],
+        "portfolio_name": row[1],
+        "user_data": json.loads(row[2]),
+        "portfolio": json.loads(row[3]),
+    }
+
+
+class PortfolioStore:
+    """
+    SQLite-backed storage for saved portfolios.
+
+    Each portfolio is one row, so saving is a single insert and lookups by id or name go through an
+    index instead of decoding every saved portfolio. Each row also stores the fingerprint of its user
+    profile, so duplicate profiles are found with a single indexed lookup. Writes are serialised by SQLite, which lets
+    concurrent sessions save without losing each other's portfolios.
+
+    On first use, portfolios from the legacy `portfolios.json` file are imported once, and investments
+    saved before they were normalized at parse time are converted to the normalized form once. Portfolios
+    whose investments cannot be validated stay in the database, but are marked invalid and never returned.
+
+    Query results are decoded once and cached for the whole process, shared by every session. The cache is
+    keyed by the modification time and size of the database and its write-ahead log, so writes from other
+    processes are picked up, and writes through this store invalidate it immediately. Cached results are
+    returned as read-only `FrozenDict`s and tuples.
+
+    Attributes:
+    - db_path (str): Path to the SQLite database file.
+    - legacy_json_path (str): Path to the legacy JSON file to migrate from.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, legacy_json_path=LEGACY_JSON_PATH, cache_size=DEFAULT_CACHE_SIZE):
+        self.db_path = db_path
+        self.legacy_json_path = legacy_json_path
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        self._cache = ResponseCache(max_size=cache_size, ttl_seconds=float("inf"))
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.executescript(SCHEMA)
+                    self._add_fingerprint_column(connection)
+                    self._add_valid_column(connection)
+                    self._migrate_legacy_json(connection)
+                    self._normalize_investments(connection)
+                    self._initialized = True
+        return connection
+
+    def _add_fingerprint_column(self, connection):
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(portfolios)")]
+            if "fingerprint" not in columns:
+                connection.execute("ALTER TABLE portfolios ADD COLUMN fingerprint TEXT")
+            rows = connection.execute("SELECT id, user_data FROM portfolios WHERE fingerprint IS NULL").fetchall()
+            connection.executemany(
+                "UPDATE portfolios SET fingerprint = ? WHERE id = ?",
+                [(profile_fingerprint(json.loads(user_data)), portfolio_id) for portfolio_id, user_data in rows]
+            )
+            connection.execute(FINGERPRINT_INDEX)
+
+    def _add_valid_column(self, connection):
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(portfolios)")]
+            if "valid" not in columns:
+                connection.execute("ALTER TABLE portfolios ADD COLUMN valid INTEGER NOT NULL DEFAULT 1")
+
+    def _migrate_legacy_json(self, connection):
+        with connection:
+            # Take the write lock up front so concurrent processes cannot both import the file
+            connection.execute("BEGIN IMMEDIATE")
+            migrated = connection.execute("SELECT value FROM meta WHERE key = 'legacy_json_migrated'").fetchone()
+            if migrated or not os.path.exists(self.legacy_json_path):
+                return
+            try:
+                with open(self.legacy_json_path, "r") as file:
+                    legacy_portfolios = json.load(file)
+            except json.JSONDecodeError:
+                legacy_portfolios = []
+            connection.executemany(
+                "INSERT INTO portfolios (portfolio_name, user_data, portfolio, fingerprint) VALUES (?, ?, ?, ?)",
+                [
+                    (p["portfolio_name"], json.dumps(p["user_data"]), json.dumps(p["portfolio"]),
+                     profile_fingerprint(p["user_data"]))
+                    for p in legacy_portfolios
+                ]
+            )
+            connection.execute("INSERT INTO meta (key, value) VALUES ('legacy_json_migrated', '1')")
+
+    def _normalize_investments(self, connection):
+        # Normalizing is idempotent, so stores normalized before invalid rows were hidden are simply checked again
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            validated = connection.execute("SELECT value FROM meta WHERE key = 'investments_validated'").fetchone()
+            if validated:
+                return
+            updates = []
+            invalid = []
+            for portfolio_id, portfolio_name, portfolio in connection.execute("SELECT id, portfolio_name, portfolio FROM portfolios"):
+                try:
+                    updates.append((json.dumps(validate_investments(json.loads(portfolio))), portfolio_id))
+                except ValueError as e:
+                    print(f"Hiding portfolio '{portfolio_name}', its investments are invalid: {e}")
+                    invalid.append((portfolio_id,))
+            connection.executemany("UPDATE portfolios SET portfolio = ? WHERE id = ?", updates)
+            connection.executemany("UPDATE portfolios SET valid = 0 WHERE id = ?", invalid)
+            connection.execute("INSERT INTO meta (key, value) VALUES ('investments_validated', '1')")
+
+    def add(self, user_data, investments, portfolio_name):
+        """
+        Save a new portfolio.
+
+        Parameters:
+        - user_data (dict): A dictionary containing user data.
+        - investments (list): A list of investments in the portfolio.
+        - portfolio_name (str): The name of the portfolio.
+
+        Returns:
+        - int: The id of the saved portfolio.
+        """
+        connection = self._connect()
+        try:
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO portfolios (portfolio_name, user_data, portfolio, fingerprint) VALUES (?, ?, ?, ?)",
+                    (portfolio_name, json.dumps(user_data), json.dumps(investments), profile_fingerprint(user_data))
+                )
+            return cursor.lastrowid
+        finally:
+            connection.close()
+            self._invalidate()
+
+    def add_many(self, portfolios):
+        """
+        Save several portfolios in a single transaction.
+
+        Parameters:
+        - portfolios (list): Tuples `(user_data, investments, portfolio_name)`.
+        """
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT INTO portfolios (portfolio_name, user_data, portfolio, fingerprint) VALUES (?, ?, ?, ?)",
+                    [
+                        (portfolio_name, json.dumps(user_data), json.dumps(investments), profile_fingerprint(user_data))
+                        for user_data, investments, portfolio_name in portfolios
+                    ]
+                )
+        finally:
+            connection.close()
+            self._invalidate()
+
+    def clear_cache(self):
+        """
+        Drop every cached query result, so that the next queries read the database again.
+        """
+        self._cache.clear()
+
+    def _invalidate(self):
+        with self._writes_lock:
+            self._writes += 1
+        self._cache.clear()
+
+    def _version(self):
+        version = [self._writes]
+        for path in (self.db_path, f"{self.db_path}-wal"):
+            try:
+                stat = os.stat(path)
+                version.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                version.append(None)
+        return tuple(version)
+
+    def _cached(self, key, compute):
+        # A write during the query at worst stores newer data under the older version, which is never read again
+        return self._cache.get_or_compute((self._version(), key), lambda: _freeze(compute()))
+
+    def _fetch(self, query, parameters=()):
+        connection = self._connect()
+        try:
+            return connection.execute(query, parameters).fetchall()
+        finally:
+            connection.close()
+
+    def get(self, portfolio_id):
+        """
+        Look up a portfolio by id.
+
+        Parameters:
+        - portfolio_id (int): The id of the portfolio.
+
+        Returns:
+        - dict or None: The portfolio with its 'id', 'portfolio_name', 'user_data' and 'portfolio', or None if not found.
+        """
+        def query():
+            rows = self._fetch(
+                "SELECT id, portfolio_name, user_data, portfolio FROM portfolios WHERE id = ? AND valid = 1", (portfolio_id,)
+            )
+            return _row_to_portfolio(rows[0]) if rows else None
+        return self._cached(("get", portfolio_id), query)
+
+    def get_by_name(self, portfolio_name):
+        """
+        Look up the first portfolio saved under a name.
+
+        Parameters:
+        - portfolio_name (str): The name of the portfolio.
+
+        Returns:
+        - dict or None: The portfolio, or None if not found.
+        """
+        def query():
+            rows = self._fetch(
+                "SELECT id, portfolio_name, user_data, portfolio FROM portfolios WHERE portfolio_name = ? AND valid = 1 ORDER BY id LIMIT 1",
+                (portfolio_name,)
+            )
+            return _row_to_portfolio(rows[0]) if rows else None
+        return self._cached(("get_by_name", portfolio_name), query)
+
+    def find_by_profile(self, user_data):
+        """
+        Look up the first portfolio saved for an equivalent user profile.
+
+        Parameters:
+        - user_data (dict): A dictionary containing user data.
+
+        Returns:
+        - dict or None: The portfolio, or None if no portfolio was saved for that profile.
+        """
+        fingerprint = profile_fingerprint(user_data)
+
+        def query():
+            rows = self._fetch(
+                "SELECT id, portfolio_name, user_data, portfolio FROM portfolios WHERE fingerprint = ? AND valid = 1 ORDER BY id LIMIT 1",
+                (fingerprint,)
+            )
+            return _row_to_portfolio(rows[0]) if rows else None
+        return self._cached(("find_by_profile", fingerprint), query)
+
+    def list_names(self):
+        """
+        List the names of all saved portfolios by id, in the order they were saved.
+
+        Several portfolios can share a name, so callers should select a portfolio by its id and look it up with `get`.
+
+        Returns:
+        - FrozenDict: The portfolio names, keyed by portfolio id.
+        """
+        return self._cached(
+            ("list_names",), lambda: dict(self._fetch("SELECT id, portfolio_name FROM portfolios WHERE valid = 1 ORDER BY id"))
+        )
+
+    def list_all(self):
+        """
+        Load every saved portfolio, in the order they were saved.
+
+        Returns:
+        - tuple: The portfolios.
+        """
+        def query():
+            rows = self._fetch("SELECT id, portfolio_name, user_data, portfolio FROM portfolios WHERE valid = 1 ORDER BY id")
+            return [_row_to_portfolio(row) for row in rows]
+        return self._cached(("list_all",), query)
+
+
+portfolio_store = PortfolioStore()
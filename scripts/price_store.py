@@ -0,0 +1,157 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from timing import span
+
+DEFAULT_CACHE_DIR = "price_cache"
+DEFAULT_TTL_SECONDS = 12 * 60 * 60
+PRICE_COLUMN = "Adj Close"
+
+# Cached bars fetched again on every refresh, to detect a history re-adjusted for a split or dividend
+OVERLAP_BARS = 5
+
+
+def yahoo_fetcher(ticker, start=None):
+    """
+    Download the adjusted close history of a ticker from Yahoo Finance.
+
+    Parameters:
+    - ticker (str): The Yahoo Finance ticker.
+    - start (pandas.Timestamp, optional): First date to download. The full history is downloaded if omitted.
+
+    Returns:
+    - pandas.Series: Adjusted close prices indexed by date.
+    """
+    import yfinance as yf
+
+    if start is None:
+        data = yf.download(ticker, period="max", progress=False)
+    else:
+        data = yf.download(ticker, start=start.strftime("%Y-%m-%d"), progress=False)
+    if data.empty:
+        return pd.Series(dtype=float, name=PRICE_COLUMN)
+    prices = data[PRICE_COLUMN]
+    if isinstance(prices, pd.DataFrame):
+        prices = prices.iloc[:, 0]
+    return prices.rename(PRICE_COLUMN)
+
+
+def csv_fetcher(directory):
+    """
+    Build a fetcher that reads fixture prices from `<directory>/<ticker>.csv` instead of the network.
+
+    Each file needs a `Date` column and an `Adj Close` column.
+
+    Parameters:
+    - directory (str): Directory holding the fixture files.
+
+    Returns:
+    - callable: A fetcher with the same signature as `yahoo_fetcher`.
+    """
+    def fetch(ticker, start=None):
+        prices = pd.read_csv(os.path.join(directory, f"{ticker}.csv"), index_col="Date", parse_dates=True)[PRICE_COLUMN]
+        if start is not None:
+            prices = prices[prices.index >= start]
+        return prices
+    return fetch
+
+
+class PriceStore:
+    """
+    Local price history store with one Parquet file per ticker.
+
+    A cached ticker is served from disk until its file is older than `ttl_seconds`. After that only
+    the last few cached bars and the dates past them are fetched. Adjusted closes are rescaled over the
+    whole history after every split and dividend, so if the refetched bars no longer match the cached
+    ones, the full history is downloaded again and replaces the file instead of being appended to.
+
+    Attributes:
+    - cache_dir (str): Directory holding the Parquet files.
+    - ttl_seconds (float): Age after which a cached ticker is refreshed.
+    - fetcher (callable): Function `(ticker, start) -> pandas.Series` returning adjusted close prices.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl_seconds=DEFAULT_TTL_SECONDS, fetcher=yahoo_fetcher):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.fetcher = fetcher
+
+    def _path(self, ticker):
+        safe_ticker = ticker.replace("/", "_").replace(os.sep, "_")
+        return os.path.join(self.cache_dir, f"{safe_ticker}.parquet")
+
+    def _read(self, ticker):
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path)[PRICE_COLUMN]
+
+    def _write(self, ticker, prices):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(ticker)
+        tmp_path = f"{path}.tmp"
+        prices.rename(PRICE_COLUMN).to_frame().to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    def is_fresh(self, ticker):
+        """
+        Check whether the cached history of a ticker is younger than the TTL.
+
+        Parameters:
+        - ticker (str): The ticker to check.
+
+        Returns:
+        - bool: True if the ticker is cached and does not need refreshing.
+        """
+        path = self._path(ticker)
+        return os.path.exists(path) and time.time() - os.path.getmtime(path) < self.ttl_seconds
+
+    def get_prices(self, ticker):
+        """
+        Return the adjusted close history of a ticker, fetching only the dates missing from the cache.
+
+        Parameters:
+        - ticker (str): The ticker to load.
+
+        Returns:
+        - pandas.Series: Adjusted close prices indexed by date.
+        """
+        cached = self._read(ticker)
+        if cached is not None and self.is_fresh(ticker):
+            return cached
+
+        if cached is None or cached.empty:
+            with span("prices.fetch", ticker=ticker):
+                prices = self.fetcher(ticker, None)
+        else:
+            last_bar = cached.index[-1]
+            overlap_start = cached.index[-min(OVERLAP_BARS, len(cached))]
+            with span("prices.fetch", ticker=ticker, start=overlap_start):
+                fetched = self.fetcher(ticker, overlap_start)
+            if self._is_readjusted(cached, fetched[fetched.index <= last_bar]):
+                with span("prices.fetch", ticker=ticker, readjusted=True):
+                    prices = self.fetcher(ticker, None)
+            else:
+                new_prices = fetched[fetched.index > last_bar]
+                prices = pd.concat([cached, new_prices]) if not new_prices.empty else cached
+
+        if prices.empty:
+            return prices
+        if prices is cached:
+            # Nothing new past the last bar, only mark the file as checked
+            os.utime(self._path(ticker))
+        else:
+            self._write(ticker, prices)
+        return prices
+
+    @staticmethod
+    def _is_readjusted(cached, overlap):
+        overlap = overlap.dropna()
+        if overlap.empty:
+            return False
+        previous = cached.reindex(overlap.index)
+        return bool(previous.isna().any() or not np.allclose(overlap.to_numpy(), previous.to_numpy(), rtol=1e-6))
+
+
+price_store = PriceStore()
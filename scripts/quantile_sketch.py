@@ -0,0 +1,92 @@
+import numpy as np
+
+DEFAULT_RELATIVE_ACCURACY = 0.005
+DEFAULT_MIN_VALUE = 0.01
+DEFAULT_MAX_VALUE = 1e15
+
+
+class MonthlyQuantileSketch:
+    """
+    Mergeable per-month quantile sketch with a bounded relative error.
+
+    Values are counted in logarithmic buckets whose bounds grow by a factor
+    `gamma = (1 + relative_accuracy) / (1 - relative_accuracy)`. Every value between `min_value` and
+    `max_value` is estimated within `relative_accuracy` of itself. Values below `min_value`, including
+    zero, are counted in a single bucket reported as 0. Values above `max_value` are reported as
+    `max_value`.
+
+    A quantile estimate is therefore within `relative_accuracy` of the order statistic closest to the
+    requested rank. For the path counts this is used with, adjacent order statistics are practically
+    equal, so the estimate is within `relative_accuracy` of the exact percentile. The memory used is
+    `months x buckets` counters, whatever the number of values added.
+
+    Attributes:
+    - counts (numpy.ndarray): Number of values per month and bucket.
+    - total (int): Number of values added per month.
+    """
+
+    def __init__(self, months, relative_accuracy=DEFAULT_RELATIVE_ACCURACY,
+                 min_value=DEFAULT_MIN_VALUE, max_value=DEFAULT_MAX_VALUE):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.min_value = min_value
+        self.max_value = max_value
+        self._min_index = int(np.ceil(np.log(min_value) / self._log_gamma))
+        self._max_index = int(np.ceil(np.log(max_value) / self._log_gamma))
+        # Bucket 0 holds the values below min_value
+        self.buckets = self._max_index - self._min_index + 2
+        self.counts = np.zeros((months, self.buckets), dtype=np.int64)
+        self.total = 0
+
+    def add(self, values):
+        """
+        Add a chunk of paths to the sketch.
+
+        Parameters:
+        - values (numpy.ndarray): Values of shape (paths, months).
+        """
+        paths, months = values.shape
+        with np.errstate(divide='ignore', invalid='ignore'):
+            indices = np.ceil(np.log(values) / self._log_gamma)
+        indices = np.clip(np.nan_to_num(indices, nan=self._min_index, neginf=self._min_index),
+                          self._min_index, self._max_index).astype(np.int64) - self._min_index + 1
+        indices[values < self.min_value] = 0
+
+        flat_indices = indices + np.arange(months) * self.buckets
+        self.counts += np.bincount(flat_indices.ravel(), minlength=months * self.buckets).reshape(months, self.buckets)
+        self.total += paths
+
+    def merge(self, other):
+        """
+        Add the counts of another sketch with the same configuration to this one.
+
+        Parameters:
+        - other (MonthlyQuantileSketch): The sketch to merge.
+        """
+        self.counts += other.counts
+        self.total += other.total
+
+    def percentiles(self, percentiles=(50, 95, 5)):
+        """
+        Estimate percentiles of the values for each month.
+
+        Parameters:
+        - percentiles (tuple): Percentiles to estimate, between 0 and 100.
+
+        Returns:
+        - numpy.ndarray: Array of shape (len(percentiles), months).
+        """
+        cumulative = np.cumsum(self.counts, axis=1)
+        bucket_values = np.empty(self.buckets)
+        bucket_values[0] = 0.0
+        upper_bounds = self.gamma ** np.arange(self._min_index, self._max_index + 1)
+        bucket_values[1:] = np.minimum(2 * upper_bounds / (self.gamma + 1), self.max_value)
+
+        estimates = []
+        for percentile in percentiles:
+            # Rank of the order statistic closest to the linearly interpolated percentile
+            rank = int(round((self.total - 1) * percentile / 100))
+            bucket = (cumulative <= rank).sum(axis=1)
+            estimates.append(bucket_values[bucket])
+        return np.array(estimates)
@@ -0,0 +1,180 @@
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from price_store import price_store
+
+DEFAULT_INDEX_DIR = "return_index"
+RETURN_COLUMN = "Return"
+
+
+def monthly_closes(prices):
+    """
+    Resample daily prices to month-end closes, keeping only the months that have closed.
+
+    A month is closed once the price history contains a bar in a later month.
+
+    Parameters:
+    - prices (pandas.Series): Daily prices indexed by date.
+
+    Returns:
+    - pandas.Series: Month-end closes indexed by month-end date.
+    """
+    prices = prices.dropna()
+    if prices.empty:
+        return prices
+    closes = prices.resample('ME').last().dropna()
+    current_month = prices.index[-1].to_period('M').to_timestamp(how='end').normalize()
+    return closes[closes.index < current_month]
+
+
+class ReturnIndex:
+    """
+    Persisted index of monthly returns for each ticker.
+
+    Each ticker has a Parquet file with its monthly return series and a JSON file with the last indexed
+    month and its close. The series is extended with the months that closed since the last update, so the
+    daily history is only resampled from the last indexed month on. If the close of the last indexed month
+    no longer matches the price history, the history was re-adjusted for a split or dividend and the
+    series is rebuilt from the full history.
+
+    Attributes:
+    - store (PriceStore): Source of the daily price history.
+    - index_dir (str): Directory holding the index files.
+    - ttl_seconds (float): Age after which a ticker is checked for newly closed months.
+    """
+
+    def __init__(self, store=price_store, index_dir=DEFAULT_INDEX_DIR, ttl_seconds=None):
+        self.store = store
+        self.index_dir = index_dir
+        self.ttl_seconds = store.ttl_seconds if ttl_seconds is None else ttl_seconds
+
+    def _path(self, ticker, extension):
+        safe_ticker = ticker.replace("/", "_").replace(os.sep, "_")
+        return os.path.join(self.index_dir, f"{safe_ticker}.{extension}")
+
+    def _read(self, ticker):
+        returns_path = self._path(ticker, "parquet")
+        last_close_path = self._path(ticker, "json")
+        if not (os.path.exists(returns_path) and os.path.exists(last_close_path)):
+            return None, None
+        with open(last_close_path, "r") as file:
+            last_close = json.load(file)
+        return pd.read_parquet(returns_path)[RETURN_COLUMN], last_close
+
+    def _write(self, ticker, returns, last_close):
+        os.makedirs(self.index_dir, exist_ok=True)
+        returns_path = self._path(ticker, "parquet")
+        last_close_path = self._path(ticker, "json")
+        returns.rename(RETURN_COLUMN).to_frame().to_parquet(f"{returns_path}.tmp")
+        with open(f"{last_close_path}.tmp", "w") as file:
+            json.dump(last_close, file)
+        os.replace(f"{returns_path}.tmp", returns_path)
+        os.replace(f"{last_close_path}.tmp", last_close_path)
+
+    def _is_fresh(self, ticker):
+        path = self._path(ticker, "json")
+        return os.path.exists(path) and time.time() - os.path.getmtime(path) < self.ttl_seconds
+
+    @staticmethod
+    def _matches(prices, last_close):
+        # Indexes written before the last close was recorded cannot be checked, so they are rebuilt once
+        if "month" not in last_close:
+            return False
+        if last_close["month"] is None:
+            return True
+        closes = prices.dropna().loc[:pd.Timestamp(last_close["month"])]
+        return not closes.empty and bool(np.isclose(closes.iloc[-1], last_close["close"], rtol=1e-6, atol=0.0))
+
+    def _update(self, ticker, returns, last_close):
+        prices = self.store.get_prices(ticker)
+        if returns is not None and not self._matches(prices, last_close):
+            returns = None
+        if returns is not None and not returns.empty:
+            # The close of the last indexed month is needed for the return of the following one
+            last_month = returns.index[-1]
+            prices = prices[prices.index >= last_month - pd.offsets.MonthBegin(1)]
+        closes = monthly_closes(prices)
+        new_returns = closes.pct_change().dropna()
+        if returns is not None and not returns.empty:
+            new_returns = new_returns[new_returns.index > returns.index[-1]]
+
+        if new_returns.empty and returns is not None:
+            os.utime(self._path(ticker, "json"))
+            return returns
+
+        returns = new_returns if returns is None else pd.concat([returns, new_returns])
+        last_close = {"month": returns.index[-1].isoformat(), "close": float(closes.loc[returns.index[-1]])} \
+            if not returns.empty else {"month": None}
+        self._write(ticker, returns, last_close)
+        return returns
+
+    def _load(self, ticker):
+        returns, last_close = self._read(ticker)
+        if returns is None or not self._is_fresh(ticker):
+            returns = self._update(ticker, returns, last_close)
+        return returns
+
+    def get_returns(self, ticker):
+        """
+        Return the monthly return series of a ticker.
+
+        Parameters:
+        - ticker (str): The ticker to load.
+
+        Returns:
+        - pandas.Series: Monthly returns indexed by month-end date.
+        """
+        return self._load(ticker)
+
+    def aligned_returns(self, tickers):
+        """
+        Return the monthly returns of several tickers over the months they all have in common.
+
+        Parameters:
+        - tickers (list): The tickers to load.
+
+        Returns:
+        - pandas.DataFrame: One column per ticker, in the order given. Without tickers, a frame without rows or columns.
+        """
+        if not tickers:
+            return pd.DataFrame()
+        return pd.concat({ticker: self.get_returns(ticker) for ticker in tickers}, axis=1)[list(tickers)].dropna()
+
+    def covariance(self, tickers):
+        """
+        Estimate the mean vector and covariance matrix of monthly returns over the common months.
+
+        Parameters:
+        - tickers (list): The tickers to load.
+
+        Returns:
+        - means (numpy.ndarray): Mean monthly return of each ticker.
+        - covariance (numpy.ndarray): Sample covariance matrix of shape (len(tickers), len(tickers)).
+        """
+        if not tickers:
+            return np.zeros(0), np.zeros((0, 0))
+        returns = self.aligned_returns(tickers).to_numpy()
+        return returns.mean(axis=0), np.atleast_2d(np.cov(returns, rowvar=False))
+
+    def portfolio_moments(self, tickers, weights):
+        """
+        Compute the mean and standard deviation of the monthly return of a weighted basket of tickers.
+
+        Parameters:
+        - tickers (list): The tickers in the basket.
+        - weights (list): Weight of each ticker in the basket.
+
+        Returns:
+        - mean (float): Mean monthly return of the basket.
+        - std (float): Standard deviation of the monthly return of the basket. Both are 0 for an empty basket.
+        """
+        if not tickers:
+            return 0.0, 0.0
+        weights = np.asarray(weights, dtype=float)
+        means, covariance = self.covariance(tickers)
+        return float(means @ weights), float(np.sqrt(weights @ covariance @ weights))
+
+
+return_index = ReturnIndex()
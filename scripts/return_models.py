@@ -0,0 +1,141 @@
+import hashlib
+import numpy as np
+from investments import category_totals
+from return_index import return_index
+from path_cache import PathCache, get_path_cache
+from simulation_engine import (MEAN_BOND_RETURN, STD_BOND_RETURN, MEAN_CASH_RETURN, STD_CASH_RETURN, gaussian_sampler,
+                               correlated_sampler, bootstrap_sampler)
+
+# Return models selectable on the simulation page, by display name
+RETURN_MODELS = {
+    "Gaussian": "gaussian",
+    "Correlated Holdings": "correlated",
+    "Historical Bootstrap": "bootstrap",
+}
+
+
+def portfolio_allocations(investments):
+    """
+    Split the investments of a portfolio into the allocations used by the simulation.
+
+    Parameters:
+    - investments (list): Normalized investments, see `investments.validate_investments`.
+
+    Returns:
+    - tickers (list): Tickers of the stocks.
+    - stock_alloc_overall (float): Overall allocation to stocks in the portfolio.
+    - stock_alloc_individual (list): Allocation to each stock within the stock allocation.
+    - bond_alloc (float): Allocation to bonds in the portfolio.
+    - cash_alloc (float): Allocation to cash in the portfolio.
+    """
+    totals = category_totals(investments)
+    stock_alloc_overall = totals.get('Stock', 0.0)
+    bond_alloc = totals.get('Bond', 0.0)
+    cash_alloc = totals.get('Cash', 0.0)
+
+    stocks = [inv for inv in investments if inv['category'] == 'Stock']
+    tickers = [inv['ticker'] for inv in stocks]
+    stock_alloc_individual = [inv['weight'] / stock_alloc_overall for inv in stocks]
+
+    return tickers, stock_alloc_overall, stock_alloc_individual, bond_alloc, cash_alloc
+
+
+def return_model_inputs(model, tickers, stock_alloc_overall, stock_alloc_individual, bond_alloc, cash_alloc):
+    """
+    Assemble the inputs of a return model from the monthly return index.
+
+    Parameters:
+    - model (str): Return model, one of the values of `RETURN_MODELS`.
+    - tickers (list): List of stock tickers.
+    - stock_alloc_overall (float): Overall allocation to stocks in the portfolio.
+    - stock_alloc_individual (list): Allocation to each stock within the stock allocation.
+    - bond_alloc (float): Allocation to bonds in the portfolio.
+    - cash_alloc (float): Allocation to cash in the portfolio.
+
+    Returns:
+    - dict: Keyword arguments of the model's simulation function, without the cash flows and path counts.
+    """
+    stock_weights = stock_alloc_overall * np.asarray(stock_alloc_individual, dtype=float)
+
+    if model == "correlated":
+        stock_means, stock_covariance = return_index.covariance(tickers)
+        means = np.concatenate([stock_means, [MEAN_BOND_RETURN, MEAN_CASH_RETURN]])
+        covariance = np.zeros((len(means), len(means)))
+        covariance[:-2, :-2] = stock_covariance
+        covariance[-2, -2] = STD_BOND_RETURN ** 2
+        covariance[-1, -1] = STD_CASH_RETURN ** 2
+        return {"means": means, "covariance": covariance, "weights": np.concatenate([stock_weights, [bond_alloc, cash_alloc]])}
+
+    if model == "bootstrap":
+        return {
+            # Without stocks, resample a single month in which the (empty) stock part returns nothing
+            "historical_returns": return_index.aligned_returns(tickers).to_numpy() if tickers else np.zeros((1, 0)),
+            "historical_weights": stock_weights,
+            "means": [MEAN_BOND_RETURN, MEAN_CASH_RETURN],
+            "stds": [STD_BOND_RETURN, STD_CASH_RETURN],
+            "weights": [bond_alloc, cash_alloc],
+        }
+
+    mean_stock_return, std_stock_return = return_index.portfolio_moments(tickers, stock_alloc_individual)
+    return {
+        "means": [mean_stock_return, MEAN_BOND_RETURN, MEAN_CASH_RETURN],
+        "stds": [std_stock_return, STD_BOND_RETURN, STD_CASH_RETURN],
+        "weights": [stock_alloc_overall, bond_alloc, cash_alloc],
+    }
+
+
+def model_sampler(model, inputs):
+    """
+    Create the sampler of a return model.
+
+    Parameters:
+    - model (str): Return model, one of the values of `RETURN_MODELS`.
+    - inputs (dict): The model inputs, as returned by `return_model_inputs`.
+
+    Returns:
+    - callable: The sampler. It returns asset returns for the 'correlated' model, to be compounded holding by
+      holding with `inputs["weights"]`, and portfolio returns otherwise.
+    """
+    if model == "correlated":
+        return correlated_sampler(inputs["means"], inputs["covariance"])
+    if model == "bootstrap":
+        return bootstrap_sampler(**inputs)
+    return gaussian_sampler(**inputs)
+
+
+def build_path_cache(model, inputs, simulations, seed):
+    """
+    Create an empty path cache sampling from a return model.
+
+    Parameters:
+    - model (str): Return model, one of the values of `RETURN_MODELS`.
+    - inputs (dict): The model inputs, as returned by `return_model_inputs`.
+    - simulations (int): Number of paths.
+    - seed (int, optional): Random seed for reproducibility.
+
+    Returns:
+    - PathCache: Paths sampled on demand from the model.
+    """
+    asset_weights = inputs["weights"] if model == "correlated" else None
+    return PathCache(model_sampler(model, inputs), simulations, seed, asset_weights)
+
+
+def cached_paths(model, inputs, simulations, seed):
+    """
+    Return the cached sampled paths for a return model and its inputs.
+
+    Parameters:
+    - model (str): Return model, one of the values of `RETURN_MODELS`.
+    - inputs (dict): The model inputs, as returned by `return_model_inputs`.
+    - simulations (int): Number of paths.
+    - seed (int, optional): Random seed for reproducibility.
+
+    Returns:
+    - PathCache: Paths shared by every rerun with the same model, inputs, paths and seed.
+    """
+    digest = hashlib.sha1()
+    for name in sorted(inputs):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(inputs[name], dtype=float).tobytes())
+    key = (model, digest.hexdigest(), simulations, seed)
+    return get_path_cache(key, lambda: build_path_cache(model, inputs, simulations, seed))
@@ -1,16 +1,25 @@
 import streamlit as st
-import yfinance as yf
 import numpy as np
-import pandas as pd
 import plotly.graph_objects as go
-from ai_call import load_all_portfolios
+from ai_call import load_portfolio_names, load_portfolio
+from decumulation import (WITHDRAWAL_RULES, DEFAULT_WITHDRAWAL_RATE, retirement_returns, simulate_withdrawals,
+                          sustainable_withdrawals)
+from goal_seek import required_contribution, required_months
+from return_models import RETURN_MODELS, portfolio_allocations, return_model_inputs, model_sampler, cached_paths
+from simulation_result import SimulationResult, DEFAULT_PERCENTILES
+from timing import span, timed
+from simulation_engine import (simulate_values, percentile_bands, simulate_percentiles_parallel,
+                               simulate_percentiles_streaming, simulate_values_correlated,
+                               simulate_values_bootstrap, percentile_standard_errors,
+                               VARIANCE_REDUCTION_METHODS)
 
-def monte_carlo_simulation(tickers, stock_alloc_overall, stock_alloc_individual, bond_alloc, cash_alloc, initial_deposit, monthly_contribution, years, simulations, seed=None):
+@timed("simulation.monte_carlo")
+def monte_carlo_simulation(tickers, stock_alloc_overall, stock_alloc_individual, bond_alloc, cash_alloc, initial_deposit, monthly_contribution, years, simulations, seed=None, workers=None, streaming=False, model="gaussian", incremental=False, variance_reduction=None, percentiles=DEFAULT_PERCENTILES, inputs=None, paths=None):
     """
     Perform Monte Carlo simulation to estimate the future portfolio values.
 
     Parameters:
-    - tickers (list): List of stock tickers to download data for.
+    - tickers (list): List of stock tickers to load price history for.
     - stock_alloc_overall (float): Overall allocation to stocks in the portfolio.
     - stock_alloc_individual (pandas.Series): Individual allocations to stocks in the portfolio.
     - bond_alloc (float): Allocation to bonds in the portfolio.
@@ -20,53 +29,84 @@ def monte_carlo_simulation(tickers, stock_alloc_overall, stock_alloc_individual,
     - years (int): Number of years to simulate.
     - simulations (int): Number of simulations to run.
     - seed (int, optional): Random seed for reproducibility.
+    - workers (int, optional): Number of processes to spread the paths over. The simulation runs in this
+      process if omitted. Each worker sends back a quantile sketch rather than its paths, so estimates are
+      within 0.5% of the exact percentiles. Results for a seed are the same for any number of workers, but
+      differ from the in-process results.
+    - streaming (bool): Estimate the percentiles chunk by chunk with bounded memory instead of keeping
+      every path. Estimates are within 0.5% of the exact percentiles.
+    - model (str): Return model. 'gaussian' draws one return for the whole stock basket from its mean and
+      standard deviation. 'correlated' simulates every stock separately with correlated returns from the
+      covariance matrix of their monthly returns, letting holdings drift between contributions.
+      'bootstrap' resamples 12-month blocks of the stocks' historical monthly returns.
+      `streaming` only applies to the 'gaussian' model.
+    - incremental (bool): Reuse the sampled paths of previous calls with the same model inputs, seed and
+      number of simulations, so that only the cash flow arithmetic is redone when the deposit or the
+      contribution change. A longer horizon extends the cached paths.
+    - variance_reduction (str, optional): 'antithetic' to draw the paths in pairs with opposite normal draws,
+      or 'sobol' to draw them from a scrambled Sobol sequence, for more precise percentiles with fewer paths.
+      Only applies to the 'gaussian' and 'correlated' models.
+    - percentiles (tuple): Percentiles of the portfolio value to compute for each month, between 0 and 100.
+    - inputs (dict, optional): Inputs of the return model from `return_model_inputs`, assembled from the
+      allocations if omitted. Pass them when the caller needs them too, to read the return index only once.
+    - paths (PathCache, optional): Sampled paths from `cached_paths` for these inputs, used when `incremental`.
 
     Returns:
-    - median_values (pandas.Series): Median portfolio values for each time period.
-    - optimistic_values (pandas.Series): Optimistic (95th percentile) portfolio values for each time period.
-    - pessimistic_values (pandas.Series): Pessimistic (5th percentile) portfolio values for each time period.
-    """
-    if seed is not None:
-        np.random.seed(seed)
-    
-    data = yf.download(tickers, period="max")['Adj Close']
-    
-    monthly_returns = data.resample('ME').ffill().pct_change().dropna()
-
-    weighted_stock_returns = (monthly_returns * stock_alloc_individual).sum(axis=1)
-    
-    mean_bond_return = 0.035 / 12
-    std_bond_return = 0.06 / np.sqrt(12)
-    
-    mean_cash_return = 0.015 / 12
-    std_cash_return = 0.01 / np.sqrt(12)
-
-    mean_stock_return = weighted_stock_returns.mean()
-    std_stock_return = weighted_stock_returns.std()
+    - SimulationResult: The percentile bands of the portfolio value for each month.
 
-    all_simulations = []
-
-    for _ in range(simulations):
-        portfolio_value = initial_deposit
-        portfolio_values = [portfolio_value]
-        for i in range(years * 12):
-            random_stock_return = np.random.normal(mean_stock_return, std_stock_return)
-            random_bond_return = np.random.normal(mean_bond_return, std_bond_return)
-            random_cash_return = np.random.normal(mean_cash_return, std_cash_return)
-            total_return = (random_stock_return * stock_alloc_overall + 
-                            random_bond_return * bond_alloc + 
-                            random_cash_return * cash_alloc)
-            portfolio_value = (portfolio_value + monthly_contribution) * (1 + total_return)
-            portfolio_values.append(portfolio_value)
-        all_simulations.append(portfolio_values)
+    Raises:
+    - ValueError: If the model is unknown or the options cannot be combined. At most one of `workers`,
+      `streaming` and `incremental` can be used, not together with `variance_reduction`.
+    """
+    if model not in RETURN_MODELS.values():
+        raise ValueError(f"unknown return model '{model}', expected one of {list(RETURN_MODELS.values())}")
+    modes = [name for name, enabled in (("workers", workers is not None), ("streaming", streaming),
+                                        ("incremental", incremental)) if enabled]
+    if len(modes) > 1:
+        raise ValueError(f"{' and '.join(modes)} cannot be combined")
+    if variance_reduction is not None and modes:
+        raise ValueError(f"variance_reduction cannot be combined with {modes[0]}")
+    if variance_reduction is not None and model == "bootstrap":
+        raise ValueError("variance_reduction does not apply to the 'bootstrap' model")
+    if streaming and model != "gaussian":
+        raise ValueError(f"streaming only applies to the 'gaussian' model, not '{model}'")
 
-    simulation_df = pd.DataFrame(all_simulations).T
+    if inputs is None:
+        with span("simulation.model_inputs", model=model):
+            inputs = return_model_inputs(model, tickers, stock_alloc_overall, stock_alloc_individual, bond_alloc, cash_alloc)
+    months = years * 12
 
-    median_values = simulation_df.median(axis=1)
-    optimistic_values = simulation_df.quantile(0.95, axis=1)
-    pessimistic_values = simulation_df.quantile(0.05, axis=1)
+    if incremental:
+        if paths is None:
+            paths = cached_paths(model, inputs, simulations, seed)
+        simulation_values = paths.values(initial_deposit, monthly_contribution, months)
+        bands = percentile_bands(simulation_values, percentiles)
+    elif workers is not None:
+        bands = simulate_percentiles_parallel(
+            model_sampler(model, inputs), initial_deposit, monthly_contribution, months, simulations, percentiles, seed,
+            workers, asset_weights=inputs["weights"] if model == "correlated" else None
+        )
+    elif model == "correlated":
+        simulation_values = simulate_values_correlated(
+            **inputs, initial_deposit=initial_deposit, monthly_contribution=monthly_contribution, months=months,
+            simulations=simulations, seed=seed, variance_reduction=variance_reduction
+        )
+        bands = percentile_bands(simulation_values, percentiles)
+    elif model == "bootstrap":
+        simulation_values = simulate_values_bootstrap(
+            **inputs, initial_deposit=initial_deposit, monthly_contribution=monthly_contribution, months=months,
+            simulations=simulations, seed=seed
+        )
+        bands = percentile_bands(simulation_values, percentiles)
+    elif streaming:
+        bands = simulate_percentiles_streaming(
+            inputs["means"], inputs["stds"], inputs["weights"], initial_deposit, monthly_contribution, months, simulations, percentiles, seed
+        )
+    else:
+        simulation_values = simulate_values(inputs["means"], inputs["stds"], inputs["weights"], initial_deposit, monthly_contribution, months, simulations, seed, variance_reduction=variance_reduction)
+        bands = percentile_bands(simulation_values, percentiles)
 
-    return median_values, optimistic_values, pessimistic_values
+    return SimulationResult(percentiles, bands)
 
 def simulation_page():
     """
@@ -79,23 +119,23 @@ def simulation_page():
     """
     st.title("📈 Simulation")
 
-    all_portfolios = load_all_portfolios()
-    if not all_portfolios:
+    portfolio_options = load_portfolio_names()
+    if not portfolio_options:
         st.warning("No portfolios generated yet. Please go to the Portfolio Creation page to generate a portfolio.")
         return
 
     st.sidebar.title("Modify Simulation Parameters")
-    portfolio_options = [f"{portfolio['portfolio_name']}" for portfolio in all_portfolios]
-    selected_portfolio = st.sidebar.selectbox("Select a portfolio to simulate", portfolio_options)
+    selected_portfolio = st.sidebar.selectbox("Select a portfolio to simulate", list(portfolio_options), format_func=portfolio_options.get)
     
-    if selected_portfolio:
-        portfolio_index = portfolio_options.index(selected_portfolio)
-        investments = all_portfolios[portfolio_index]['portfolio']
-        user_data = all_portfolios[portfolio_index]['user_data']
+    if selected_portfolio is not None:
+        portfolio = load_portfolio(selected_portfolio)
+        investments = portfolio['portfolio']
+        user_data = portfolio['user_data']
         
         retirement_age = st.sidebar.number_input("Retirement Age", min_value=user_data['age'] + 1, max_value=100, value=user_data['retirement_age'])
         initial_deposit = st.sidebar.number_input("Initial Deposit", min_value=0, value=user_data['Initial_investment'])
         monthly_contribution = st.sidebar.number_input("Monthly Contribution", min_value=0, value=user_data['monthly_contribution'])
+        return_model = st.sidebar.selectbox("Return Model", list(RETURN_MODELS))
         years = retirement_age - user_data['age']
         simulations = 1000
         seed = 42
@@ -104,25 +144,19 @@ def simulation_page():
             st.error("Retirement age must be greater than current age.")
             return
         
-        stock_alloc_overall = sum([float(inv['allocation'].replace('%', '')) / 100 for inv in investments if inv['category'] == 'Stock'])
-        bond_alloc = sum([float(inv['allocation'].replace('%', '')) / 100 for inv in investments if inv['category'] == 'Bond'])
-        cash_alloc = sum([float(inv['allocation'].replace('%', '')) / 100 for inv in investments if inv['category'] == 'Cash'])
+        tickers, stock_alloc_overall, stock_alloc_individual, bond_alloc, cash_alloc = portfolio_allocations(investments)
 
-        tickers = [inv['ticker'] for inv in investments if inv['category'] == 'Stock']
-        stock_alloc_individual = [float(inv['allocation'].replace('%', '')) / 100 for inv in investments if inv['category'] == 'Stock']
-        stock_alloc_individual = [alloc / stock_alloc_overall for alloc in stock_alloc_individual]
+        model = RETURN_MODELS[return_model]
+        with span("simulation.model_inputs", model=model):
+            inputs = return_model_inputs(model, tickers, stock_alloc_overall, stock_alloc_individual, bond_alloc, cash_alloc)
+        with span("simulation.cached_paths"):
+            paths = cached_paths(model, inputs, simulations, seed)
 
-        median_values, optimistic_values, pessimistic_values = monte_carlo_simulation(tickers, stock_alloc_overall, stock_alloc_individual, bond_alloc, cash_alloc, initial_deposit, monthly_contribution, years, simulations, seed)
-
-        results_df = pd.DataFrame({
-            'Month': range(len(median_values)),
-            'Median Value': median_values,
-            'Optimistic Value': optimistic_values,
-            'Pessimistic Value': pessimistic_values
-        })
+        result = monte_carlo_simulation(tickers, stock_alloc_overall, stock_alloc_individual, bond_alloc, cash_alloc, initial_deposit, monthly_contribution, years, simulations, seed, model=model, incremental=True, inputs=inputs, paths=paths)
+        final_median_value = result.final(50)
 
         total_deposited = initial_deposit + (monthly_contribution * years * 12)
-        extra_revenue_generated = median_values.iloc[-1] - total_deposited
+        extra_revenue_generated = final_median_value - total_deposited
 
         # Display the summary boxes
         
@@ -131,37 +165,169 @@ def simulation_page():
         with col1:
             st.metric(label="💰 Total Amount Deposited", value=f"${total_deposited:,.2f}")
         with col2:
-            st.metric(label="📈 Final Portfolio Value (Median)", value=f"${median_values.iloc[-1]:,.2f}")
+            st.metric(label="📈 Final Portfolio Value (Median)", value=f"${final_median_value:,.2f}")
         with col3:
             st.metric(label="📊 Extra Revenue Generated (Median)", value=f"${extra_revenue_generated:,.2f}")
 
         # Plot the projection results
-        fig = go.Figure()
-
-        fig.add_trace(go.Scatter(x=results_df['Month'], y=results_df['Median Value'],
-                                 mode='lines', name='Median Value'))
-        fig.add_trace(go.Scatter(x=results_df['Month'], y=results_df['Optimistic Value'],
-                                 mode='lines', name='Optimistic Value (95th Percentile)'))
-        fig.add_trace(go.Scatter(x=results_df['Month'], y=results_df['Pessimistic Value'],
-                                 mode='lines', name='Pessimistic Value (5th Percentile)'))
-
-        fig.update_layout(title='Portfolio Value Over Time',
-                          xaxis_title='Month',
-                          yaxis_title='Portfolio Value ($)',
-                          template='plotly_white')
-
-        st.plotly_chart(fig)
+        # Every month is only sent to the browser on request, long horizons are otherwise downsampled
+        resolution = "monthly" if st.checkbox("Show every month") else "adaptive"
+        with span("simulation.render_chart", points=len(result.display_months(resolution)), resolution=resolution):
+            st.plotly_chart(result.figure(resolution))
         
         # Explanation Text
-        final_median_value = median_values.iloc[-1]
-        years_post_retirement = 80 - retirement_age
-        months_post_retirement = years_post_retirement * 12
-        monthly_withdrawal = final_median_value / months_post_retirement
-
         st.write(f"""
         Based on the median projection, your portfolio could grow to **\${final_median_value:,.2f}** by the time you retire. 
-        However, considering the optimistic and pessimistic scenarios, your portfolio could range from **\${pessimistic_values.iloc[-1]:,.2f}** to **\${optimistic_values.iloc[-1]:,.2f}**.
-
-        Assuming you live until the age of 80, you would be able to withdraw approximately **\${monthly_withdrawal:,.2f}** per month from your median portfolio value.
+        However, considering the optimistic and pessimistic scenarios, your portfolio could range from **\${result.final(5):,.2f}** to **\${result.final(95):,.2f}**.
         """)
 
+        display_retirement_income(paths, retirement_age, years * 12, initial_deposit, monthly_contribution, final_median_value)
+        display_goal_seek(paths, user_data['age'], retirement_age, initial_deposit, monthly_contribution)
+        display_convergence_diagnostic(model, inputs, initial_deposit, monthly_contribution, years * 12, seed)
+
+@timed("simulation.retirement_income")
+def display_retirement_income(paths, retirement_age, months, initial_deposit, monthly_contribution, final_median_value):
+    """
+    Displays the withdrawal phase: the chance of running out of money under a withdrawal rule and the
+    withdrawal the portfolio can sustain.
+
+    Every sampled path continues past retirement from its own balance, on the same paths as the projection above.
+
+    Parameters:
+    - paths (PathCache): The sampled return paths of the simulation.
+    - retirement_age (int): The selected retirement age.
+    - months (int): Number of months until retirement.
+    - initial_deposit (float): The initial deposit amount.
+    - monthly_contribution (float): The monthly contribution amount.
+    - final_median_value (float): The median portfolio value at retirement.
+
+    Returns:
+    None
+    """
+    st.subheader("🏖️ Retirement Income")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        plan_until_age = st.number_input("Plan Until Age", min_value=retirement_age + 1, max_value=120, value=max(90, retirement_age + 1))
+    with col2:
+        withdrawal_rule = st.selectbox("Withdrawal Rule", list(WITHDRAWAL_RULES))
+    with col3:
+        if WITHDRAWAL_RULES[withdrawal_rule] == "percentage":
+            withdrawal_rate = st.number_input("Yearly Withdrawal Rate (%)", min_value=0.0, max_value=100.0, value=DEFAULT_WITHDRAWAL_RATE * 100, step=0.5)
+            monthly_withdrawal = 0.0
+        else:
+            default_withdrawal = round(final_median_value * DEFAULT_WITHDRAWAL_RATE / 12, -1)
+            monthly_withdrawal = st.number_input("First Monthly Withdrawal", min_value=0.0, value=default_withdrawal, step=100.0)
+            withdrawal_rate = DEFAULT_WITHDRAWAL_RATE * 100
+
+    withdrawal_months = (plan_until_age - retirement_age) * 12
+    start_balances = paths.values(initial_deposit, monthly_contribution, months)[:, -1]
+    returns = retirement_returns(paths, months, withdrawal_months)
+    balances, withdrawals, ruined = simulate_withdrawals(
+        start_balances, returns, WITHDRAWAL_RULES[withdrawal_rule], monthly_withdrawal, withdrawal_rate / 100
+    )
+    safe_withdrawal, median_withdrawal = sustainable_withdrawals(start_balances, returns, (5, 50))
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric(label="⚠️ Probability of Running Out", value=f"{ruined.mean():.1%}")
+    with col2:
+        st.metric(label="💵 Median Monthly Income", value=f"${np.median(withdrawals.mean(axis=1)):,.2f}")
+    with col3:
+        st.metric(label=f"🏦 Median Balance at {plan_until_age}", value=f"${np.median(balances[:, -1]):,.2f}")
+
+    st.write(f"""
+    Withdrawing an amount that rises with inflation every month until the age of {plan_until_age}, your portfolio could sustain 
+    a first withdrawal of about **\${median_withdrawal:,.2f}** per month in half of the simulated scenarios, and 
+    **\${safe_withdrawal:,.2f}** per month in 95% of them.
+    """)
+
+@timed("simulation.goal_seek")
+def display_goal_seek(paths, age, retirement_age, initial_deposit, monthly_contribution):
+    """
+    Displays a panel solving for the monthly contribution or the retirement age needed to reach a target value.
+
+    The solver works on the same sampled paths as the projection above, so no new simulation is run.
+
+    Parameters:
+    - paths (PathCache): The sampled return paths of the simulation.
+    - age (int): The client's current age.
+    - retirement_age (int): The selected retirement age.
+    - initial_deposit (float): The initial deposit amount.
+    - monthly_contribution (float): The monthly contribution amount.
+
+    Returns:
+    None
+    """
+    with st.expander("🎯 Goal Seek"):
+        target_value = st.number_input("Target Portfolio Value", min_value=0, value=1_000_000, step=10_000)
+        confidence = st.slider("Confidence Level (%)", min_value=50, max_value=99, value=90)
+        solve_for = st.radio("Solve For", ("Monthly Contribution", "Retirement Age"), horizontal=True)
+
+        if solve_for == "Monthly Contribution":
+            contribution = required_contribution(paths, initial_deposit, (retirement_age - age) * 12, target_value, confidence / 100)
+            st.write(f"""
+            To have **{confidence}%** of the simulated scenarios above **\${target_value:,.2f}** at age {retirement_age}, 
+            you would need to contribute approximately **\${contribution:,.2f}** per month.
+            """)
+        else:
+            months = required_months(paths, initial_deposit, monthly_contribution, target_value, confidence / 100, (100 - age) * 12)
+            if months is None:
+                st.warning(f"With a monthly contribution of \${monthly_contribution:,.2f}, the target is not reached with {confidence}% confidence before age 100.")
+            else:
+                st.write(f"""
+                With a monthly contribution of **\${monthly_contribution:,.2f}**, **{confidence}%** of the simulated scenarios 
+                reach **\${target_value:,.2f}** by age **{age + months // 12}**.
+                """)
+
+@timed("simulation.convergence_diagnostic")
+def display_convergence_diagnostic(model, inputs, initial_deposit, monthly_contribution, months, seed):
+    """
+    Displays, on request, the standard error of the 5th percentile of the final value against the number
+    of paths, for each variance reduction method.
+
+    Parameters:
+    - model (str): Return model, one of the values of `RETURN_MODELS`.
+    - inputs (dict): Inputs of the return model, see `return_model_inputs`.
+    - initial_deposit (float): The initial deposit amount.
+    - monthly_contribution (float): The monthly contribution amount.
+    - months (int): Number of months until retirement.
+    - seed (int): Random seed for reproducibility.
+
+    Returns:
+    None
+    """
+    with st.expander("📉 Convergence Diagnostic"):
+        if model == "bootstrap":
+            st.info("Variance reduction applies to the Gaussian and Correlated Holdings models.")
+            return
+        if not st.button("Run Diagnostic"):
+            return
+
+        simulate = simulate_values_correlated if model == "correlated" else simulate_values
+        path_counts = [128, 256, 512, 1024]
+        fig = go.Figure()
+        standard_errors = {}
+        for name, method in VARIANCE_REDUCTION_METHODS.items():
+            with st.spinner(f"Simulating with variance reduction: {name}..."):
+                standard_errors[name] = percentile_standard_errors(
+                    lambda simulations, replication_seed: simulate(
+                        **inputs, initial_deposit=initial_deposit, monthly_contribution=monthly_contribution, months=months,
+                        simulations=simulations, seed=replication_seed, variance_reduction=method
+                    ),
+                    path_counts, (5,), seed=seed
+                )[:, 0]
+            fig.add_trace(go.Scatter(x=path_counts, y=standard_errors[name], mode='lines+markers', name=name))
+
+        fig.update_layout(title='Standard Error of the 5th Percentile at Retirement',
+                          xaxis_title='Number of Paths',
+                          yaxis_title='Standard Error ($)',
+                          xaxis_type='log',
+                          yaxis_type='log',
+                          template='plotly_white')
+        st.plotly_chart(fig)
+
+        # Plain Monte Carlo needs (error ratio)^2 times as many paths for the same precision
+        baseline = standard_errors["None"][-1]
+        st.write("Paths saved at the same precision, compared with plain Monte Carlo: " + ", ".join(
+            f"**{name}** {(baseline / errors[-1]) ** 2:.1f}x" for name, errors in standard_errors.items() if name != "None"
+        ))
@@ -0,0 +1,638 @@
+import os
+import threading
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
+from scipy.special import ndtri
+from scipy.stats import qmc
+from quantile_sketch import MonthlyQuantileSketch, DEFAULT_RELATIVE_ACCURACY
+
+# Annualised assumptions for the asset classes that are not backed by price history
+MEAN_BOND_RETURN = 0.035 / 12
+STD_BOND_RETURN = 0.06 / np.sqrt(12)
+
+MEAN_CASH_RETURN = 0.015 / 12
+STD_CASH_RETURN = 0.01 / np.sqrt(12)
+
+# Number of paths drawn and projected at once, bounds the size of the temporary arrays
+DEFAULT_CHUNK_SIZE = 10_000
+
+# Number of (path, month, asset) elements per chunk when every asset is simulated separately
+DEFAULT_CHUNK_ELEMENTS = 20_000_000
+
+# Default length in months of the blocks resampled by the historical bootstrap
+DEFAULT_BLOCK_LENGTH = 12
+
+# Variance reduction methods for the normal draws, by display name
+VARIANCE_REDUCTION_METHODS = {
+    "None": None,
+    "Antithetic Variates": "antithetic",
+    "Sobol QMC": "sobol",
+}
+
+# Cholesky factors by covariance matrix, reused across reruns of the same portfolio and shared by sessions
+_cholesky_cache = OrderedDict()
+_cholesky_cache_lock = threading.Lock()
+_CHOLESKY_CACHE_SIZE = 32
+
+
+def _brownian_bridge(draws):
+    """
+    Turn standard normal draws into monthly increments with a Brownian bridge.
+
+    The first draw sets the cumulative sum over the whole horizon, the next ones the midpoints of the
+    remaining intervals, and so on. The increments have the same distribution as independent draws,
+    but the best distributed dimensions of a quasi-random sequence drive the overall shape of each path.
+
+    Parameters:
+    - draws (numpy.ndarray): Standard normal draws of shape (paths, months, assets), in bridge order.
+
+    Returns:
+    - numpy.ndarray: Independent standard normal increments of the same shape, in month order.
+    """
+    # Work month-major so that every step reads and writes contiguous memory
+    draws = np.ascontiguousarray(np.swapaxes(draws, 0, 1))
+    months = len(draws)
+    cumulative = np.empty((months + 1,) + draws.shape[1:])
+    cumulative[0] = 0.0
+    cumulative[months] = np.sqrt(months) * draws[0]
+
+    intervals = [(0, months)]
+    dimension = 1
+    for left, right in intervals:
+        if right - left < 2:
+            continue
+        middle = (left + right) // 2
+        cumulative[middle] = ((right - middle) * cumulative[left] + (middle - left) * cumulative[right]) / (right - left)
+        cumulative[middle] += np.sqrt((middle - left) * (right - middle) / (right - left)) * draws[dimension]
+        dimension += 1
+        intervals.append((left, middle))
+        intervals.append((middle, right))
+    return np.swapaxes(np.diff(cumulative, axis=0), 0, 1)
+
+
+def normal_draws(method, months, assets, seed=None):
+    """
+    Build a generator of standard normal draws with an optional variance reduction method.
+
+    - None: independent pseudo-random draws.
+    - 'antithetic': each chunk is made of pairs of paths with opposite draws `z` and `-z`.
+    - 'sobol': scrambled Sobol points, one dimension per month and asset, mapped to normal draws with the
+      inverse normal distribution and ordered with a Brownian bridge. Successive calls continue the same
+      sequence; a number of paths that is a power of two gives the most even coverage. Sobol sequences have
+      at most `qmc.Sobol.MAXDIM` dimensions, so for long horizons with many assets the last, finest levels
+      of the bridge are pseudo-random, which only matter little for the shape of the paths.
+
+    Parameters:
+    - method (str or None): The variance reduction method, one of the values of `VARIANCE_REDUCTION_METHODS`.
+    - months (int): Number of months per path.
+    - assets (int): Number of assets drawn per month.
+    - seed (int, optional): Random seed for reproducibility.
+
+    Returns:
+    - callable: A function `(simulations) -> draws` returning draws of shape (simulations, months, assets).
+    """
+    random_state = np.random.default_rng(seed)
+
+    if method == "sobol":
+        dimensions = months * assets
+        sobol_dimensions = min(dimensions, qmc.Sobol.MAXDIM)
+        engine = qmc.Sobol(sobol_dimensions, scramble=True, seed=random_state)
+        # Keep the inverse normal finite for points on the edge of the unit cube
+        epsilon = np.finfo(float).eps
+
+        def draw(simulations):
+            with warnings.catch_warnings():
+                warnings.filterwarnings("ignore", message=".*balance properties of Sobol' points.*")
+                points = engine.random(simulations)
+            if sobol_dimensions < dimensions:
+                points = np.hstack([points, random_state.random((simulations, dimensions - sobol_dimensions))])
+            draws = ndtri(np.clip(points, epsilon, 1 - epsilon)).reshape(simulations, months, assets)
+            return _brownian_bridge(draws)
+    elif method == "antithetic":
+        def draw(simulations):
+            draws = random_state.standard_normal((-(-simulations // 2), months, assets))
+            return np.concatenate([draws, -draws])[:simulations]
+    elif method is None:
+        def draw(simulations):
+            return random_state.standard_normal((simulations, months, assets))
+    else:
+        raise ValueError(f"Unknown variance reduction method: {method}")
+    return draw
+
+
+def growth_factors(returns):
+    """
+    Compute the cumulative growth factors of a batch of return paths.
+
+    With contributions made at the start of each month, the value of a path is linear in the deposit and
+    the contribution: `value[t] = initial_deposit * growth[t] + monthly_contribution * contribution_growth[t]`.
+
+    Parameters:
+    - returns (numpy.ndarray): Monthly returns of shape (paths, months), or (paths, months, assets) to
+      compound each asset separately. Returns must stay above -100%.
+
+    Returns:
+    - growth (numpy.ndarray): Growth of one dollar invested at month 0, shape (paths, months + 1, ...).
+    - contribution_growth (numpy.ndarray): Value of one dollar contributed every month, shape (paths, months + 1, ...).
+    """
+    paths, months = returns.shape[:2]
+    growth = np.empty((paths, months + 1) + returns.shape[2:])
+    growth[:, 0] = 1.0
+    np.cumprod(1.0 + returns, axis=1, out=growth[:, 1:])
+
+    contribution_growth = np.empty_like(growth)
+    contribution_growth[:, 0] = 0.0
+    np.cumsum(1.0 / growth[:, :-1], axis=1, out=contribution_growth[:, 1:])
+    contribution_growth[:, 1:] *= growth[:, 1:]
+
+    return growth, contribution_growth
+
+
+def project_values(returns, initial_deposit, monthly_contribution):
+    """
+    Project portfolio values along a batch of return paths.
+
+    Parameters:
+    - returns (numpy.ndarray): Monthly returns of shape (paths, months).
+    - initial_deposit (float): Initial deposit amount.
+    - monthly_contribution (float): Monthly contribution amount.
+
+    Returns:
+    - numpy.ndarray: Portfolio values of shape (paths, months + 1), starting with the initial deposit.
+    """
+    growth, contribution_growth = growth_factors(returns)
+    return initial_deposit * growth + monthly_contribution * contribution_growth
+
+
+def compound_holdings(returns, holdings, contribution=None):
+    """
+    Compound separate holdings month by month, without rebalancing.
+
+    Each month the contribution is added to the holdings at the start of the month, and every holding
+    then grows by its own return, so allocations drift with performance. Holdings are updated in place,
+    so besides the returns only one (paths, assets) array is held.
+
+    Parameters:
+    - returns (numpy.ndarray): Monthly asset returns of shape (paths, months, assets).
+    - holdings (numpy.ndarray): Value of each holding of shape (paths, assets), updated to the last month.
+    - contribution (numpy.ndarray, optional): Amount added to each holding every month, shape (assets,).
+
+    Returns:
+    - numpy.ndarray: Total value of the holdings at the end of each month, shape (paths, months).
+    """
+    paths, months = returns.shape[:2]
+    values = np.empty((paths, months))
+    for month in range(months):
+        if contribution is not None:
+            holdings += contribution
+        holdings *= 1.0 + returns[:, month]
+        values[:, month] = holdings.sum(axis=1)
+    return values
+
+
+def project_holdings(returns, weights, initial_deposit, monthly_contribution):
+    """
+    Project portfolio values along a batch of asset return paths, compounding every holding separately.
+
+    Parameters:
+    - returns (numpy.ndarray): Monthly asset returns of shape (paths, months, assets).
+    - weights (numpy.ndarray): Allocation of the deposit and of each contribution to each asset.
+    - initial_deposit (float): Initial deposit amount.
+    - monthly_contribution (float): Monthly contribution amount.
+
+    Returns:
+    - numpy.ndarray: Portfolio values of shape (paths, months + 1), starting with the initial deposit.
+    """
+    paths = len(returns)
+    values = np.empty((paths, returns.shape[1] + 1))
+    values[:, 0] = initial_deposit * weights.sum()
+    holdings = np.tile(initial_deposit * weights, (paths, 1))
+    values[:, 1:] = compound_holdings(returns, holdings, monthly_contribution * weights)
+    return values
+
+
+def gaussian_sampler(means, stds, weights):
+    """
+    Build a sampler drawing monthly portfolio returns from independent normal asset classes.
+
+    The normal draws are taken as one (simulations x months x asset class) array. Because the legacy
+    generator fills arrays in C order, a seeded RandomState produces exactly the same draws as calling
+    `np.random.normal` once per asset class, per month, per path.
+
+    Parameters:
+    - means (array-like): Mean monthly return of each asset class.
+    - stds (array-like): Standard deviation of the monthly return of each asset class.
+    - weights (array-like): Allocation to each asset class.
+
+    Returns:
+    - callable: A sampler `(random_state, simulations, months, draws=None) -> returns` returning portfolio
+      returns of shape (simulations, months). `draws` replaces the standard normal draws of the generator,
+      e.g. with draws from `normal_draws`. Samplers can be pickled, to sample in worker processes.
+    """
+    return partial(_sample_gaussian, np.asarray(means, dtype=float), np.asarray(stds, dtype=float),
+                   np.asarray(weights, dtype=float))
+
+
+def _sample_gaussian(means, stds, weights, random_state, simulations, months, draws=None):
+    if draws is None:
+        draws = random_state.standard_normal((simulations, months, len(means)))
+    return (means + stds * draws) @ weights
+
+
+def correlated_sampler(means, covariance):
+    """
+    Build a sampler drawing correlated monthly returns for every asset as `means + z @ L.T`, with `z`
+    standard normal and `L` the Cholesky factor of the covariance matrix.
+
+    Draws and returns are single precision: drawing and multiplying the (paths x months x assets) normal
+    variates dominates the cost of the model, and float32 roughly halves it. Monthly returns keep about
+    seven significant digits, far below the sampling error of the simulation.
+
+    Parameters:
+    - means (array-like): Mean monthly return of each asset.
+    - covariance (array-like): Covariance matrix of the monthly asset returns.
+
+    Returns:
+    - callable: A sampler `(random_state, simulations, months, draws=None) -> returns` returning float32 asset
+      returns of shape (simulations, months, assets), see `gaussian_sampler` for `draws`. `random_state`
+      must be a `numpy.random.Generator`.
+    """
+    return partial(_sample_correlated, np.asarray(means, dtype=np.float32), cholesky_factor(covariance).T.astype(np.float32))
+
+
+def _sample_correlated(means, factor_transposed, random_state, simulations, months, draws=None):
+    if draws is None:
+        draws = random_state.standard_normal((simulations, months, len(means)), dtype=np.float32)
+    returns = np.matmul(draws.astype(np.float32, copy=False), factor_transposed)
+    returns += means
+    return returns
+
+
+def bootstrap_sampler(historical_returns, historical_weights, means, stds, weights, block_length=DEFAULT_BLOCK_LENGTH):
+    """
+    Build a sampler resampling blocks of historical monthly returns.
+
+    The historical return vectors are collapsed once into the monthly return of that part of the
+    portfolio, then gathered for all paths at once through block bootstrap indices. Keeping whole
+    months and runs of consecutive months preserves fat tails, cross-asset correlation and short-term
+    autocorrelation. Assets without history are drawn from normal distributions as in `gaussian_sampler`.
+
+    Parameters:
+    - historical_returns (array-like): Monthly returns of the assets with history, shape (history months, assets).
+    - historical_weights (array-like): Allocation to each asset with history.
+    - means (array-like): Mean monthly return of each asset without history.
+    - stds (array-like): Standard deviation of the monthly return of each asset without history.
+    - weights (array-like): Allocation to each asset without history.
+    - block_length (int): Number of consecutive historical months per block.
+
+    Returns:
+    - callable: A sampler `(random_state, simulations, months) -> returns` returning portfolio returns of
+      shape (simulations, months).
+    """
+    historical_returns = np.asarray(historical_returns, dtype=float)
+    historical_portfolio_returns = historical_returns.reshape(len(historical_returns), -1) @ np.ravel(historical_weights)
+    sample_normal = gaussian_sampler(means, stds, weights) if len(np.ravel(means)) else None
+    return partial(_sample_bootstrap, historical_portfolio_returns, sample_normal, block_length)
+
+
+def _sample_bootstrap(historical_portfolio_returns, sample_normal, block_length, random_state, simulations, months):
+    indices = bootstrap_indices(random_state, len(historical_portfolio_returns), simulations, months, block_length)
+    returns = historical_portfolio_returns[indices]
+    if sample_normal is not None:
+        returns += sample_normal(random_state, simulations, months)
+    return returns
+
+
+def simulate_values(means, stds, weights, initial_deposit, monthly_contribution, months, simulations,
+                    seed=None, chunk_size=DEFAULT_CHUNK_SIZE, variance_reduction=None):
+    """
+    Simulate portfolio values for every path, processing the paths in chunks.
+
+    Without variance reduction, the draws are those of the legacy generator seeded with `seed`.
+
+    Parameters:
+    - means (array-like): Mean monthly return of each asset class.
+    - stds (array-like): Standard deviation of the monthly return of each asset class.
+    - weights (array-like): Allocation to each asset class.
+    - initial_deposit (float): Initial deposit amount.
+    - monthly_contribution (float): Monthly contribution amount.
+    - months (int): Number of months to simulate.
+    - simulations (int): Number of paths to simulate.
+    - seed (int, optional): Random seed for reproducibility.
+    - chunk_size (int): Number of paths drawn at once.
+    - variance_reduction (str, optional): Variance reduction method for the normal draws, see `normal_draws`.
+
+    Returns:
+    - numpy.ndarray: Portfolio values of shape (simulations, months + 1).
+    """
+    sample = gaussian_sampler(means, stds, weights)
+    if variance_reduction is None:
+        random_state = np.random.RandomState(seed)
+    else:
+        draw = normal_draws(variance_reduction, months, len(np.ravel(means)), seed)
+
+    values = np.empty((simulations, months + 1))
+    for start in range(0, simulations, chunk_size):
+        stop = min(start + chunk_size, simulations)
+        if variance_reduction is None:
+            returns = sample(random_state, stop - start, months)
+        else:
+            returns = sample(None, stop - start, months, draws=draw(stop - start))
+        values[start:stop] = project_values(returns, initial_deposit, monthly_contribution)
+    return values
+
+
+def percentile_bands(values, percentiles=(50, 95, 5)):
+    """
+    Compute percentiles of the portfolio value across paths for each month.
+
+    Parameters:
+    - values (numpy.ndarray): Portfolio values of shape (paths, months + 1).
+    - percentiles (tuple): Percentiles to compute, between 0 and 100.
+
+    Returns:
+    - numpy.ndarray: Array of shape (len(percentiles), months + 1).
+    """
+    return np.percentile(values, percentiles, axis=0)
+
+
+def simulate_percentiles_streaming(means, stds, weights, initial_deposit, monthly_contribution, months, simulations,
+                                   percentiles=(50, 95, 5), seed=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                                   relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """
+    Simulate portfolio values chunk by chunk and estimate percentiles without keeping every path.
+
+    Each chunk of paths is folded into a `MonthlyQuantileSketch` and discarded, so memory depends on
+    the chunk size and the horizon but not on the number of paths. The draws are the same as in
+    `simulate_values` for a given seed, and every estimate is within `relative_accuracy` of the
+    exact percentile (see `MonthlyQuantileSketch` for the precise bound).
+
+    Parameters:
+    - means (array-like): Mean monthly return of each asset class.
+    - stds (array-like): Standard deviation of the monthly return of each asset class.
+    - weights (array-like): Allocation to each asset class.
+    - initial_deposit (float): Initial deposit amount.
+    - monthly_contribution (float): Monthly contribution amount.
+    - months (int): Number of months to simulate.
+    - simulations (int): Number of paths to simulate.
+    - percentiles (tuple): Percentiles to compute, between 0 and 100.
+    - seed (int, optional): Random seed for reproducibility.
+    - chunk_size (int): Number of paths drawn at once.
+    - relative_accuracy (float): Relative error bound of the percentile estimates.
+
+    Returns:
+    - numpy.ndarray: Array of shape (len(percentiles), months + 1).
+    """
+    sample = gaussian_sampler(means, stds, weights)
+    random_state = np.random.RandomState(seed)
+
+    sketch = MonthlyQuantileSketch(months + 1, relative_accuracy)
+    for start in range(0, simulations, chunk_size):
+        stop = min(start + chunk_size, simulations)
+        returns = sample(random_state, stop - start, months)
+        sketch.add(project_values(returns, initial_deposit, monthly_contribution))
+    return sketch.percentiles(percentiles)
+
+
+def percentile_standard_errors(simulate, path_counts, percentiles=(5, 50, 95), replications=16, seed=None):
+    """
+    Estimate the standard error of the final value percentiles for several numbers of paths.
+
+    Each number of paths is simulated `replications` times with independent seeds, and the standard error
+    is the standard deviation of the percentile across replications. Halving the standard error takes four
+    times as many plain Monte Carlo paths, so comparing methods at the same number of paths shows how many
+    paths each one saves.
+
+    Parameters:
+    - simulate (callable): Function `(simulations, seed) -> values` returning portfolio values of shape
+      (simulations, months + 1), e.g. `simulate_values` with the other arguments bound.
+    - path_counts (list): Numbers of paths to evaluate.
+    - percentiles (tuple): Percentiles of the final value to evaluate.
+    - replications (int): Number of independent simulations per number of paths, at least 2.
+    - seed (int, optional): Random seed for reproducibility.
+
+    Returns:
+    - numpy.ndarray: Standard errors of shape (len(path_counts), len(percentiles)).
+    """
+    seeds = np.random.SeedSequence(seed).generate_state(replications)
+    standard_errors = np.empty((len(path_counts), len(percentiles)))
+    for row, simulations in enumerate(path_counts):
+        estimates = [np.percentile(simulate(simulations, int(replication_seed))[:, -1], percentiles)
+                     for replication_seed in seeds]
+        standard_errors[row] = np.std(estimates, axis=0, ddof=1)
+    return standard_errors
+
+
+def cholesky_factor(covariance):
+    """
+    Return the lower triangular Cholesky factor of a covariance matrix, reusing previous factorizations.
+
+    A covariance matrix estimated from a short common history can be singular. If the factorization
+    fails, negative eigenvalues are clipped to zero and a small ridge is added to the diagonal.
+
+    Parameters:
+    - covariance (numpy.ndarray): Covariance matrix of shape (assets, assets).
+
+    Returns:
+    - numpy.ndarray: Lower triangular matrix `L` with `L @ L.T` equal to the (repaired) covariance.
+    """
+    covariance = np.ascontiguousarray(covariance, dtype=float)
+    key = (covariance.shape, covariance.tobytes())
+    with _cholesky_cache_lock:
+        factor = _cholesky_cache.get(key)
+        if factor is not None:
+            _cholesky_cache.move_to_end(key)
+            return factor
+
+    try:
+        factor = np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        repaired = (eigenvectors * np.clip(eigenvalues, 0.0, None)) @ eigenvectors.T
+        ridge = 1e-10 * max(np.trace(covariance) / len(covariance), 1e-12)
+        factor = np.linalg.cholesky(repaired + ridge * np.eye(len(covariance)))
+
+    factor.flags.writeable = False
+    with _cholesky_cache_lock:
+        _cholesky_cache[key] = factor
+        while len(_cholesky_cache) > _CHOLESKY_CACHE_SIZE:
+            _cholesky_cache.popitem(last=False)
+    return factor
+
+
+def simulate_values_correlated(means, covariance, weights, initial_deposit, monthly_contribution, months, simulations,
+                               seed=None, chunk_elements=DEFAULT_CHUNK_ELEMENTS,
+                               variance_reduction=None):
+    """
+    Simulate portfolio values with every holding compounded separately from correlated returns.
+
+    Monthly asset returns are drawn by `correlated_sampler`. The initial deposit and each contribution are
+    split by `weights`, and each holding then grows on its own without rebalancing, see `compound_holdings`.
+
+    The cost grows with paths x months x assets. It is dominated by drawing the normal variates, which
+    are single precision along with their product with the Cholesky factor, see `correlated_sampler`.
+    To spread many paths over every core, pass the sampler to `simulate_percentiles_parallel`.
+
+    Parameters:
+    - means (array-like): Mean monthly return of each asset.
+    - covariance (array-like): Covariance matrix of the monthly asset returns.
+    - weights (array-like): Allocation to each asset.
+    - initial_deposit (float): Initial deposit amount.
+    - monthly_contribution (float): Monthly contribution amount.
+    - months (int): Number of months to simulate.
+    - simulations (int): Number of paths to simulate.
+    - seed (int, optional): Random seed for reproducibility.
+    - chunk_elements (int): Approximate number of (path, month, asset) draws held in memory at once.
+    - variance_reduction (str, optional): Variance reduction method for the normal draws, see `normal_draws`.
+
+    Returns:
+    - numpy.ndarray: Portfolio values of shape (simulations, months + 1).
+    """
+    weights = np.asarray(weights, dtype=float)
+    sample = correlated_sampler(means, covariance)
+    if variance_reduction is None:
+        random_state = np.random.default_rng(seed)
+    else:
+        draw = normal_draws(variance_reduction, months, len(weights), seed)
+    chunk_size = max(1, chunk_elements // max(1, months * len(weights)))
+
+    values = np.empty((simulations, months + 1))
+    for start in range(0, simulations, chunk_size):
+        stop = min(start + chunk_size, simulations)
+        if variance_reduction is None:
+            returns = sample(random_state, stop - start, months)
+        else:
+            returns = sample(None, stop - start, months, draws=draw(stop - start))
+        values[start:stop] = project_holdings(returns, weights, initial_deposit, monthly_contribution)
+    return values
+
+
+def bootstrap_indices(random_state, history_length, simulations, months, block_length=DEFAULT_BLOCK_LENGTH):
+    """
+    Draw circular block bootstrap indices into a history of monthly returns for a batch of paths.
+
+    Each path is made of consecutive blocks of `block_length` months starting at random months of the
+    history, wrapping around at its end. All block starts are drawn in one call.
+
+    Parameters:
+    - random_state (numpy.random.Generator): Generator to draw from.
+    - history_length (int): Number of months in the history.
+    - simulations (int): Number of paths.
+    - months (int): Number of months per path.
+    - block_length (int): Number of consecutive months per block.
+
+    Returns:
+    - numpy.ndarray: Integer indices of shape (simulations, months).
+    """
+    blocks = -(-months // block_length)
+    starts = random_state.integers(0, history_length, size=(simulations, blocks, 1))
+    indices = (starts + np.arange(block_length)) % history_length
+    return indices.reshape(simulations, blocks * block_length)[:, :months]
+
+
+def simulate_values_bootstrap(historical_returns, historical_weights, means, stds, weights, initial_deposit,
+                              monthly_contribution, months, simulations, seed=None, block_length=DEFAULT_BLOCK_LENGTH,
+                              chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Simulate portfolio values by resampling blocks of historical monthly returns, see `bootstrap_sampler`.
+
+    Parameters:
+    - historical_returns (array-like): Monthly returns of the assets with history, shape (history months, assets).
+    - historical_weights (array-like): Allocation to each asset with history.
+    - means (array-like): Mean monthly return of each asset without history.
+    - stds (array-like): Standard deviation of the monthly return of each asset without history.
+    - weights (array-like): Allocation to each asset without history.
+    - initial_deposit (float): Initial deposit amount.
+    - monthly_contribution (float): Monthly contribution amount.
+    - months (int): Number of months to simulate.
+    - simulations (int): Number of paths to simulate.
+    - seed (int, optional): Random seed for reproducibility.
+    - block_length (int): Number of consecutive historical months per block.
+    - chunk_size (int): Number of paths drawn at once.
+
+    Returns:
+    - numpy.ndarray: Portfolio values of shape (simulations, months + 1).
+    """
+    sample = bootstrap_sampler(historical_returns, historical_weights, means, stds, weights, block_length)
+    random_state = np.random.default_rng(seed)
+
+    values = np.empty((simulations, months + 1))
+    for start in range(0, simulations, chunk_size):
+        stop = min(start + chunk_size, simulations)
+        returns = sample(random_state, stop - start, months)
+        values[start:stop] = project_values(returns, initial_deposit, monthly_contribution)
+    return values
+
+
+def _sketch_blocks(sampler, blocks, months, initial_deposit, monthly_contribution, asset_weights, relative_accuracy):
+    sketch = MonthlyQuantileSketch(months + 1, relative_accuracy)
+    for simulations, seed_sequence in blocks:
+        returns = sampler(np.random.default_rng(seed_sequence), simulations, months)
+        if asset_weights is None:
+            sketch.add(project_values(returns, initial_deposit, monthly_contribution))
+        else:
+            sketch.add(project_holdings(returns, asset_weights, initial_deposit, monthly_contribution))
+    return sketch
+
+
+def simulate_percentiles_parallel(sampler, initial_deposit, monthly_contribution, months, simulations,
+                                  percentiles=(50, 95, 5), seed=None, workers=None, block_size=None, asset_weights=None,
+                                  relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """
+    Simulate portfolio values across a pool of processes and estimate their percentiles.
+
+    The paths are split into fixed blocks of `block_size` paths. Each block draws from its own child of
+    `numpy.random.SeedSequence(seed)`, so the paths depend on the seed and the block size but not on the
+    number of workers. Each worker folds its share of the blocks into a `MonthlyQuantileSketch` and only
+    the sketch is sent back, so no process holds more than one block of paths. The sketches hold counts,
+    which add up to the same totals however the blocks are shared, so a seed gives exactly the same
+    percentiles for any number of workers. Estimates are within `relative_accuracy` of the exact percentiles.
+
+    The draws come from the default NumPy generator rather than the legacy one, so a seed does not give
+    the same paths as `simulate_values`.
+
+    Parameters:
+    - sampler (callable): Sampler of the return model, e.g. from `gaussian_sampler`, `correlated_sampler` or
+      `bootstrap_sampler`.
+    - initial_deposit (float): Initial deposit amount.
+    - monthly_contribution (float): Monthly contribution amount.
+    - months (int): Number of months to simulate.
+    - simulations (int): Number of paths to simulate.
+    - percentiles (tuple): Percentiles to compute, between 0 and 100.
+    - seed (int, optional): Random seed for reproducibility.
+    - workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+    - block_size (int, optional): Number of paths per block. Defaults to `DEFAULT_CHUNK_SIZE`, or to about
+      `DEFAULT_CHUNK_ELEMENTS` draws per block when the sampler returns asset returns.
+    - asset_weights (array-like, optional): Allocation to each asset when the sampler returns asset returns.
+      Each holding is then compounded separately, see `compound_holdings`.
+    - relative_accuracy (float): Relative error bound of the percentile estimates.
+
+    Returns:
+    - numpy.ndarray: Array of shape (len(percentiles), months + 1).
+    """
+    if asset_weights is not None:
+        asset_weights = np.asarray(asset_weights, dtype=float)
+    if block_size is None:
+        block_size = (DEFAULT_CHUNK_SIZE if asset_weights is None
+                      else max(1, DEFAULT_CHUNK_ELEMENTS // max(1, months * len(asset_weights))))
+    workers = workers or os.cpu_count() or 1
+
+    block_starts = range(0, simulations, block_size)
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(block_starts))
+    blocks = [(min(block_size, simulations - start), seed_sequence) for start, seed_sequence in zip(block_starts, seed_sequences)]
+    shares = [share for share in np.array_split(np.arange(len(blocks)), min(workers, len(blocks))) if len(share)]
+    arguments = (months, initial_deposit, monthly_contribution, asset_weights, relative_accuracy)
+
+    if len(shares) <= 1:
+        sketch = _sketch_blocks(sampler, blocks, *arguments)
+    else:
+        with ProcessPoolExecutor(max_workers=len(shares)) as executor:
+            sketches = [executor.submit(_sketch_blocks, sampler, [blocks[index] for index in share], *arguments)
+                        for share in shares]
+            sketch = sketches[0].result()
+            for other in sketches[1:]:
+                sketch.merge(other.result())
+    return sketch.percentiles(percentiles)
@@ -0,0 +1,199 @@
+import hashlib
+import math
+import numpy as np
+from ai_cache import ResponseCache
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Target number of points per trace for adaptive resolution, and the strides it picks from, in months
+DEFAULT_MAX_POINTS = 120
+ADAPTIVE_STEPS = (1, 2, 3, 4, 6, 12, 24, 36, 60, 120)
+RESOLUTIONS = ("monthly", "annual", "adaptive")
+
+# Figures are shared by every session showing the same result, so they are only built once
+_figure_cache = ResponseCache(max_size=64, ttl_seconds=float("inf"))
+
+
+def _ordinal(percentile):
+    text = f"{percentile:g}"
+    if text.endswith("1") and not text.endswith("11"):
+        return f"{text}st"
+    if text.endswith("2") and not text.endswith("12"):
+        return f"{text}nd"
+    if text.endswith("3") and not text.endswith("13"):
+        return f"{text}rd"
+    return f"{text}th"
+
+
+class SimulationResult:
+    """
+    Compact result of a Monte Carlo simulation: percentiles of the portfolio value for every month.
+
+    Bands are stored as a read-only float32 array, which is precise to about a dollar on a ten million dollar
+    portfolio, while the final values used for the summary figures are kept in full precision. Charts are
+    drawn from a downsampled copy of the bands, see `downsample`, and the full monthly bands stay
+    available through `band`.
+
+    Attributes:
+    - percentiles (tuple): Percentiles of the bands, between 0 and 100.
+    - bands (numpy.ndarray): float32 array of shape (len(percentiles), months + 1).
+    - months (int): Number of simulated months.
+    """
+
+    def __init__(self, percentiles, bands):
+        bands = np.asarray(bands)
+        if bands.ndim != 2 or bands.shape[0] != len(percentiles):
+            raise ValueError("expected one band of monthly values per percentile")
+        self.percentiles = tuple(percentiles)
+        self.bands = bands.astype(np.float32)
+        self.bands.flags.writeable = False
+        self._final_values = bands[:, -1].astype(np.float64)
+        self._key = None
+
+    @property
+    def months(self):
+        return self.bands.shape[1] - 1
+
+    @property
+    def key(self):
+        """
+        Digest of the percentiles and bands, identifying results with the same content.
+        """
+        if self._key is None:
+            digest = hashlib.blake2b(repr(self.percentiles).encode("utf-8"), digest_size=16)
+            digest.update(self.bands.tobytes())
+            self._key = digest.hexdigest()
+        return self._key
+
+    def _index(self, percentile):
+        try:
+            return self.percentiles.index(percentile)
+        except ValueError:
+            raise ValueError(f"percentile {percentile} was not simulated, available: {self.percentiles}") from None
+
+    def band(self, percentile):
+        """
+        Return the monthly values of one percentile at full resolution.
+
+        Parameters:
+        - percentile (float): One of `percentiles`.
+
+        Returns:
+        - numpy.ndarray: Read-only float32 array of length months + 1.
+
+        Raises:
+        - ValueError: If the percentile was not simulated.
+        """
+        return self.bands[self._index(percentile)]
+
+    def final(self, percentile):
+        """
+        Return the value of one percentile in the last month.
+
+        Parameters:
+        - percentile (float): One of `percentiles`.
+
+        Returns:
+        - float: The final value, in full precision.
+
+        Raises:
+        - ValueError: If the percentile was not simulated.
+        """
+        return float(self._final_values[self._index(percentile)])
+
+    def display_months(self, resolution="adaptive", max_points=DEFAULT_MAX_POINTS):
+        """
+        Choose the months shown on a chart. The first and last month are always included.
+
+        Parameters:
+        - resolution (str): 'monthly' for every month, 'annual' for every twelfth month, or 'adaptive' for
+          the smallest stride from `ADAPTIVE_STEPS` that keeps the chart within `max_points` points.
+        - max_points (int): Target number of points for the 'adaptive' resolution.
+
+        Returns:
+        - numpy.ndarray: Indices of the months to show, in increasing order.
+        """
+        if resolution == "monthly":
+            step = 1
+        elif resolution == "annual":
+            step = 12
+        elif resolution == "adaptive":
+            needed = math.ceil(self.months / max(max_points, 1))
+            step = next((step for step in ADAPTIVE_STEPS if step >= needed), needed)
+        else:
+            raise ValueError(f"unknown resolution '{resolution}', expected one of {RESOLUTIONS}")
+
+        months = np.arange(0, self.months + 1, step)
+        if months[-1] != self.months:
+            months = np.append(months, self.months)
+        return months
+
+    def downsample(self, resolution="adaptive", max_points=DEFAULT_MAX_POINTS):
+        """
+        Return the bands at the months chosen by `display_months`.
+
+        Parameters:
+        - resolution (str): See `display_months`.
+        - max_points (int): See `display_months`.
+
+        Returns:
+        - months (numpy.ndarray): Indices of the months shown.
+        - bands (numpy.ndarray): float32 array of shape (len(percentiles), len(months)).
+        """
+        months = self.display_months(resolution, max_points)
+        return months, self.bands[:, months]
+
+    def figure(self, resolution="adaptive", max_points=DEFAULT_MAX_POINTS):
+        """
+        Build the chart of the portfolio value over time, or reuse the one built for an identical result.
+
+        Each pair of percentiles symmetric around the median, e.g. 5 and 95, is drawn as a shaded band
+        and the median as a line. Values are rounded to whole dollars to keep the payload small.
+
+        The figure is shared, do not modify it.
+
+        Parameters:
+        - resolution (str): See `display_months`.
+        - max_points (int): See `display_months`.
+
+        Returns:
+        - plotly.graph_objects.Figure: The chart.
+        """
+        return _figure_cache.get_or_compute(
+            (self.key, resolution, max_points), lambda: self._build_figure(resolution, max_points)
+        )
+
+    def _build_figure(self, resolution, max_points):
+        import plotly.graph_objects as go
+
+        months, bands = self.downsample(resolution, max_points)
+        values = {percentile: np.round(band.astype(np.float64)) for percentile, band in zip(self.percentiles, bands)}
+        lower_percentiles = sorted(percentile for percentile in values if percentile < 50 and 100 - percentile in values)
+
+        def hover(percentile):
+            label = 'Median' if percentile == 50 else f'{_ordinal(percentile)} Percentile'
+            return f'{label}: $%{{y:,.0f}}<extra></extra>'
+
+        fig = go.Figure()
+        for rank, lower in enumerate(lower_percentiles):
+            upper = 100 - lower
+            opacity = 0.15 + 0.15 * rank
+            fig.add_trace(go.Scatter(x=months, y=values[lower], mode='lines', line=dict(width=0),
+                                     showlegend=False, hovertemplate=hover(lower)))
+            fig.add_trace(go.Scatter(x=months, y=values[upper], mode='lines', line=dict(width=0), fill='tonexty',
+                                     fillcolor=f'rgba(83, 135, 134, {opacity:.2f})', hovertemplate=hover(upper),
+                                     name=f'{_ordinal(lower)} to {_ordinal(upper)} Percentile'))
+        for percentile, band in values.items():
+            if percentile == 50:
+                fig.add_trace(go.Scatter(x=months, y=band, mode='lines', name='Median Value',
+                                         line=dict(color='#538786'), hovertemplate=hover(percentile)))
+            elif percentile not in lower_percentiles and 100 - percentile not in lower_percentiles:
+                fig.add_trace(go.Scatter(x=months, y=band, mode='lines', name=f'{_ordinal(percentile)} Percentile',
+                                         hovertemplate=hover(percentile)))
+
+        fig.update_layout(title='Portfolio Value Over Time',
+                          xaxis_title='Month',
+                          yaxis_title='Portfolio Value ($)',
+                          hovermode='x unified',
+                          template='plotly_white')
+        return fig
@@ -0,0 +1,117 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from ai_call import load_all_portfolios
+from return_index import return_index
+from return_models import RETURN_MODELS, portfolio_allocations, return_model_inputs, build_path_cache
+
+DEFAULT_RETIREMENT_AGES = [60, 65, 70]
+DEFAULT_CONTRIBUTIONS = [250, 500, 1000, 2000]
+DEFAULT_SIMULATIONS = 10_000
+DEFAULT_SEED = 42
+DEFAULT_OUTPUT = "sweep_results.parquet"
+
+
+def _sweep_portfolio(portfolio, retirement_ages, contributions, model, simulations, seed):
+    user_data = portfolio['user_data']
+    tickers, stock_alloc_overall, stock_alloc_individual, bond_alloc, cash_alloc = portfolio_allocations(portfolio['portfolio'])
+    inputs = return_model_inputs(model, tickers, stock_alloc_overall, stock_alloc_individual, bond_alloc, cash_alloc)
+    paths = build_path_cache(model, inputs, simulations, seed)
+
+    horizons = [(age, (age - user_data['age']) * 12) for age in retirement_ages if age > user_data['age']]
+    if not horizons:
+        return []
+    # Every scenario of the portfolio reads the same paths, sampled once up to the longest horizon
+    paths.extend(max(months for _, months in horizons))
+
+    initial_deposit = user_data['Initial_investment']
+    rows = []
+    for retirement_age, months in horizons:
+        growth = paths.growth[:, months]
+        contribution_growth = paths.contribution_growth[:, months]
+        for monthly_contribution in contributions:
+            final_values = initial_deposit * growth + monthly_contribution * contribution_growth
+            pessimistic, median, optimistic = np.percentile(final_values, (5, 50, 95))
+            rows.append({
+                "portfolio_id": portfolio['id'],
+                "portfolio_name": portfolio['portfolio_name'],
+                "retirement_age": retirement_age,
+                "initial_deposit": initial_deposit,
+                "monthly_contribution": monthly_contribution,
+                "total_deposited": initial_deposit + monthly_contribution * months,
+                "pessimistic_value": pessimistic,
+                "median_value": median,
+                "optimistic_value": optimistic,
+            })
+    return rows
+
+
+def run_sweep(retirement_ages=DEFAULT_RETIREMENT_AGES, contributions=DEFAULT_CONTRIBUTIONS, model="gaussian",
+              simulations=DEFAULT_SIMULATIONS, seed=DEFAULT_SEED, workers=None):
+    """
+    Simulate every saved portfolio over a grid of retirement ages and monthly contributions.
+
+    The portfolios are loaded once and the price history of each distinct ticker is refreshed once
+    before the portfolios are spread over a pool of processes. Within a portfolio, every grid point
+    is evaluated on the same sampled paths.
+
+    Parameters:
+    - retirement_ages (list): Retirement ages of the grid. Ages not above a client's age are skipped.
+    - contributions (list): Monthly contributions of the grid.
+    - model (str): Return model, one of the values of `RETURN_MODELS`.
+    - simulations (int): Number of paths per portfolio.
+    - seed (int): Random seed for reproducibility.
+    - workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+    - pandas.DataFrame: One row per portfolio and scenario, with the 5th, 50th and 95th percentiles of the
+      portfolio value at retirement.
+    """
+    portfolios = load_all_portfolios()
+
+    tickers = {inv['ticker'] for portfolio in portfolios for inv in portfolio['portfolio'] if inv['category'] == 'Stock'}
+    for ticker in sorted(tickers):
+        try:
+            return_index.get_returns(ticker)
+        except Exception as e:
+            print(f"Error loading price history for {ticker}: {e}")
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(_sweep_portfolio, portfolio, retirement_ages, contributions, model, simulations, seed): portfolio
+            for portfolio in portfolios
+        }
+        for future, portfolio in futures.items():
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                print(f"Error simulating portfolio '{portfolio['portfolio_name']}': {e}")
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate every saved portfolio over a grid of scenarios.")
+    parser.add_argument("--ages", type=int, nargs="+", default=DEFAULT_RETIREMENT_AGES, help="retirement ages of the grid")
+    parser.add_argument("--contributions", type=float, nargs="+", default=DEFAULT_CONTRIBUTIONS, help="monthly contributions of the grid")
+    parser.add_argument("--model", choices=list(RETURN_MODELS.values()), default="gaussian", help="return model")
+    parser.add_argument("--simulations", type=int, default=DEFAULT_SIMULATIONS, help="number of paths per portfolio")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="random seed")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Parquet file to write the results to")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_sweep(args.ages, args.contributions, args.model, args.simulations, args.seed, args.workers)
+    results.to_parquet(args.output, index=False)
+    elapsed = time.perf_counter() - start
+
+    per_scenario = elapsed / len(results) * 1000 if len(results) else 0.0
+    print(f"Wrote {len(results)} scenarios to {args.output} in {elapsed:.2f}s ({per_scenario:.1f} ms per scenario)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+# Set RETIREWISE_TIMING=1 to record spans. When disabled, `span` returns a shared no-op context manager.
+enabled = os.environ.get("RETIREWISE_TIMING", "") not in ("", "0")
+
+# Every finished span is logged here as one JSON object, when the logger is enabled for INFO
+logger = logging.getLogger("retirewise.timing")
+
+_local = threading.local()
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    Timed stage of a rerun, used as a context manager.
+
+    Spans opened inside another span on the same thread are nested under it.
+
+    Attributes:
+    - name (str): Name of the stage, e.g. 'ai.groq_completion'.
+    - attributes (dict): Extra fields logged with the span.
+    - depth (int): Number of enclosing spans.
+    - start (float): Start time from `time.perf_counter`.
+    - duration (float): Duration in seconds, once the span is closed.
+    """
+
+    __slots__ = ("name", "attributes", "depth", "start", "duration")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.depth = 0
+        self.start = 0.0
+        self.duration = None
+
+    def __enter__(self):
+        stack = _state().stack
+        self.depth = len(stack)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.perf_counter() - self.start
+        state = _state()
+        state.stack.pop()
+        state.spans.append(self)
+        _record(self)
+        return False
+
+
+def _state():
+    if not hasattr(_local, "spans"):
+        _local.spans = []
+        _local.stack = []
+        _local.run_start = time.perf_counter()
+    return _local
+
+
+def _count(name, duration):
+    with _counters_lock:
+        counter = _counters.get(name)
+        if counter is None:
+            counter = _counters[name] = {"count": 0, "total_s": 0.0, "max_s": 0.0}
+        counter["count"] += 1
+        counter["total_s"] += duration
+        counter["max_s"] = max(counter["max_s"], duration)
+
+
+def _record(finished_span):
+    _count(finished_span.name, finished_span.duration)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"span": finished_span.name, "duration_ms": round(finished_span.duration * 1000, 3),
+                                "depth": finished_span.depth, **finished_span.attributes}, default=str))
+
+
+def span(name, **attributes):
+    """
+    Time a stage with a `with` block.
+
+    Parameters:
+    - name (str): Name of the stage.
+    - **attributes: Extra fields logged with the span.
+
+    Returns:
+    - Span: The span, or a no-op context manager when timing is disabled.
+    """
+    if not enabled:
+        return _NULL_SPAN
+    return Span(name, attributes)
+
+
+def record(name, duration, **attributes):
+    """
+    Record a duration measured elsewhere, e.g. the time until the first part of a streamed response.
+
+    The duration is added to the counters and logged like a span, but does not appear in the run breakdown.
+
+    Parameters:
+    - name (str): Name of the metric.
+    - duration (float): Duration in seconds.
+    - **attributes: Extra fields logged with the metric.
+    """
+    if not enabled:
+        return
+    _count(name, duration)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"metric": name, "duration_ms": round(duration * 1000, 3), **attributes}, default=str))
+
+
+def timed(name):
+    """
+    Decorator timing every call of a function as a span.
+
+    Parameters:
+    - name (str): Name of the stage.
+
+    Returns:
+    - callable: The decorator.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with Span(name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_run():
+    """
+    Forget the spans of the previous run on this thread, to be called at the start of every rerun.
+    """
+    _local.spans = []
+    _local.stack = []
+    _local.run_start = time.perf_counter()
+
+
+def last_run():
+    """
+    List the spans recorded on this thread since the last call to `start_run`.
+
+    Returns:
+    - list: One dictionary per span with its 'name', 'depth', 'start_ms' from the start of the run and
+      'duration_ms', in the order the spans were opened.
+    """
+    state = _state()
+    return [
+        {"name": s.name, "depth": s.depth, "start_ms": (s.start - state.run_start) * 1000, "duration_ms": s.duration * 1000}
+        for s in sorted(state.spans, key=lambda s: s.start)
+    ]
+
+
+def counters():
+    """
+    Return the totals of every span name since the process started.
+
+    Returns:
+    - dict: For each span name, its 'count', 'total_s' and 'max_s'.
+    """
+    with _counters_lock:
+        return {name: dict(counter) for name, counter in _counters.items()}
+
+
+def render_panel():
+    """
+    Displays the stage-by-stage breakdown of the current run in a sidebar panel.
+
+    Call it at the end of the script, once every stage of the run has finished.
+
+    Returns:
+    None
+    """
+    import streamlit as st
+
+    spans = last_run()
+    total_ms = (time.perf_counter() - _state().run_start) * 1000
+    with st.sidebar.expander("⏱️ Timings"):
+        st.write(f"Last rerun: **{total_ms:,.1f} ms**")
+        if not spans:
+            st.write("No stages recorded.")
+            return
+        st.dataframe(
+            [{"Stage": "\u2003\u2003" * s["depth"] + s["name"], "ms": round(s["duration_ms"], 1)} for s in spans],
+            hide_index=True,
+            use_container_width=True
+        )
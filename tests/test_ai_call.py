@@ -0,0 +1,108 @@
+import json
+import threading
+import pytest
+
+groq = pytest.importorskip("groq")
+
+from ai_cache import ResponseCache
+from ai_call import get_portfolio, parse_investments, stream_portfolio
+from fake_groq_server import PORTFOLIO, start_fake_server
+
+USER_DATA = {"age": 30, "Initial_investment": 10000, "monthly_contribution": 500, "retirement_age": 65,
+             "ethical_values": ["Renewable energy"], "risk_aversion": "Medium"}
+
+
+@pytest.fixture
+def server():
+    server = start_fake_server(chunk_delay=0.001)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def client(server):
+    client = groq.Groq(api_key="test", base_url=f"http://127.0.0.1:{server.server_port}")
+    create = client.chat.completions.create
+    client.requests = []
+
+    def counting_create(**kwargs):
+        client.requests.append(kwargs)
+        return create(**kwargs)
+
+    client.chat.completions.create = counting_create
+    return client
+
+
+def test_concurrent_requests_share_one_call(server, client):
+    server.chunk_delay = 0.005
+    cache = ResponseCache()
+    results = [None] * 3
+
+    def request(index):
+        results[index] = get_portfolio(USER_DATA, ai_client=client, cache=cache)
+
+    threads = [threading.Thread(target=request, args=(index,)) for index in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [json.loads(result) for result in results] == [PORTFOLIO] * len(results)
+    assert get_portfolio(USER_DATA, ai_client=client, cache=cache) == results[0]
+    assert len(client.requests) == 1
+
+
+def test_invalid_responses_are_not_cached(server, client):
+    server.response = "[]"
+    cache = ResponseCache()
+    assert get_portfolio(USER_DATA, ai_client=client, cache=cache) == "[]"
+    assert get_portfolio(USER_DATA, ai_client=client, cache=cache) == "[]"
+    assert len(client.requests) == 2
+
+    server.response = json.dumps(PORTFOLIO)
+    assert json.loads(get_portfolio(USER_DATA, ai_client=client, cache=cache)) == PORTFOLIO
+    assert json.loads(get_portfolio(USER_DATA, ai_client=client, cache=cache)) == PORTFOLIO
+    assert len(client.requests) == 3
+
+
+def test_stream_yields_every_holding_and_caches_the_response(client):
+    cache = ResponseCache()
+    stream = stream_portfolio(USER_DATA, ai_client=client, cache=cache)
+    assert list(stream) == PORTFOLIO
+    assert not stream.cached
+    assert parse_investments(stream.text) is not None
+
+    replayed = stream_portfolio(USER_DATA, ai_client=client, cache=cache)
+    assert list(replayed) == PORTFOLIO
+    assert replayed.cached
+    assert get_portfolio(USER_DATA, ai_client=client, cache=cache) == stream.text
+    assert len(client.requests) == 1
+
+
+def test_concurrent_streams_share_one_call_with_blocking_requests(server, client):
+    server.chunk_delay = 0.005
+    cache = ResponseCache()
+    streams = [stream_portfolio(USER_DATA, ai_client=client, cache=cache) for _ in range(3)]
+    results = [None] * len(streams)
+
+    def read(index):
+        results[index] = list(streams[index])
+
+    threads = [threading.Thread(target=read, args=(index,)) for index in range(len(streams))]
+    for thread in threads:
+        thread.start()
+    blocking = get_portfolio(USER_DATA, ai_client=client, cache=cache)
+    for thread in threads:
+        thread.join()
+
+    assert results == [PORTFOLIO] * len(streams)
+    assert json.loads(blocking) == PORTFOLIO
+    assert len(client.requests) == 1
+
+
+def test_invalid_streamed_responses_are_not_cached(server, client):
+    server.response = "[]"
+    cache = ResponseCache()
+    assert list(stream_portfolio(USER_DATA, ai_client=client, cache=cache)) == []
+    assert list(stream_portfolio(USER_DATA, ai_client=client, cache=cache)) == []
+    assert len(client.requests) == 2
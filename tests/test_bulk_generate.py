@@ -0,0 +1,82 @@
+import asyncio
+import pytest
+
+groq = pytest.importorskip("groq")
+
+import ai_call
+from bulk_generate import generate_portfolios, parse_profile, read_profiles
+from fake_groq_server import start_fake_server
+from portfolio_store import PortfolioStore
+
+HEADER = "portfolio_name,age,Initial_investment,monthly_contribution,retirement_age,ethical_values,risk_aversion\n"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = PortfolioStore(str(tmp_path / "portfolios.db"), str(tmp_path / "missing.json"))
+    monkeypatch.setattr(ai_call, "portfolio_store", store)
+    ai_call.response_cache.clear()
+    yield store
+    ai_call.response_cache.clear()
+
+
+@pytest.fixture
+def server():
+    server = start_fake_server(chunk_delay=0)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def client(server):
+    # Retries are left to the generator, the client raises on the first rate limit error
+    return groq.Groq(api_key="test", base_url=f"http://127.0.0.1:{server.server_port}", max_retries=0)
+
+
+def generate(csv_path, client, **kwargs):
+    results = []
+    summary = asyncio.run(generate_portfolios(read_profiles(csv_path), ai_client=client, parse=parse_profile,
+                                              on_result=lambda name, status: results.append((name, status)), **kwargs))
+    return summary, dict(results)
+
+
+def test_bad_rows_fail_alone_and_duplicates_are_saved_once(tmp_path, store, server, client):
+    csv_path = tmp_path / "clients.csv"
+    csv_path.write_text(HEADER + "\n".join([
+        "Alice,30,10000,500,65,Green energy;Animal welfare,Low",
+        "Broken,30,ten thousand,500,65,,Low",
+        "Alice again,30,10000,500,65,Animal welfare;Green energy,Low",
+        "Bob,45,50000,1000,67,,High",
+        "Short,45",
+    ]))
+
+    summary, results = generate(csv_path, client)
+
+    assert results == {"Alice": "created", "Broken": "failed", "Alice again": "existing", "Bob": "created",
+                       "Short": "failed"}
+    assert (summary["created"], summary["existing"], summary["failed"]) == (2, 1, 2)
+    assert sorted(store.list_names().values()) == ["Alice", "Bob"]
+    assert server.requests == 2
+
+
+def test_rate_limited_requests_are_retried(tmp_path, store, server, client):
+    csv_path = tmp_path / "clients.csv"
+    csv_path.write_text(HEADER + "Alice,30,10000,500,65,,Low\n")
+    server.rate_limited = 2
+
+    summary, results = generate(csv_path, client, max_retries=2, base_delay=0.01)
+
+    assert results == {"Alice": "created"}
+    assert server.requests == 3
+
+
+def test_rate_limited_requests_fail_after_the_last_retry(tmp_path, store, server, client):
+    csv_path = tmp_path / "clients.csv"
+    csv_path.write_text(HEADER + "Alice,30,10000,500,65,,Low\n")
+    server.rate_limited = 5
+
+    summary, results = generate(csv_path, client, max_retries=2, base_delay=0.01)
+
+    assert results == {"Alice": "failed"}
+    assert server.requests == 3
+    assert store.list_names() == {}
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from decumulation import retirement_returns, simulate_withdrawals, sustainable_withdrawals
+from path_cache import PathCache
+from simulation_engine import gaussian_sampler
+
+MEANS = np.array([0.07 / 12, 0.035 / 12, 0.015 / 12])
+STDS = np.array([0.15 / np.sqrt(12), 0.06 / np.sqrt(12), 0.01 / np.sqrt(12)])
+WEIGHTS = np.array([0.6, 0.3, 0.1])
+
+
+@pytest.fixture(scope="module")
+def retirement():
+    paths = PathCache(gaussian_sampler(MEANS, STDS, WEIGHTS), 2000, seed=8)
+    start_balances = paths.values(100000, 1000, 360)[:, -1]
+    return start_balances, retirement_returns(paths, 360, 300)
+
+
+def test_fifth_percentile_sustainable_withdrawal_ruins_five_percent_of_paths(retirement):
+    start_balances, returns = retirement
+    withdrawal = sustainable_withdrawals(start_balances, returns, percentiles=(5,))[0]
+
+    def ruin_rate(monthly_withdrawal):
+        return simulate_withdrawals(start_balances, returns, "fixed_real", monthly_withdrawal)[2].mean()
+
+    # Within one path of 5% on either side of the solved withdrawal
+    assert 0.0495 <= ruin_rate(withdrawal * 0.999) <= 0.05 <= ruin_rate(withdrawal * 1.001) <= 0.0505
+
+
+def test_percentage_rule_never_runs_out(retirement):
+    start_balances, returns = retirement
+    balances, withdrawals, ruined = simulate_withdrawals(start_balances, returns, "percentage", withdrawal_rate=0.08)
+
+    assert not ruined.any()
+    assert (balances > 0).all()
+    np.testing.assert_allclose(withdrawals, balances[:, :-1] * 0.08 / 12)
+
+
+def test_fixed_real_withdrawals_rise_with_inflation_until_the_money_runs_out():
+    balances, withdrawals, ruined = simulate_withdrawals(np.array([1000.0, 100.0]), np.zeros((2, 24)), "fixed_real",
+                                                         monthly_withdrawal=10, annual_inflation=0.03)
+
+    np.testing.assert_allclose(withdrawals[0, 12], 10 * 1.03)
+    np.testing.assert_allclose(balances[0, -1], 1000 - withdrawals[0].sum())
+    assert ruined.tolist() == [False, True]
+    assert balances[1, -1] == 0 and withdrawals[1].sum() == pytest.approx(100)
+
+
+@pytest.mark.parametrize("monthly_return, change", [(-0.03, 0.9), (0.03, 1.1), (0.0, 1.0)])
+def test_guardrails_cut_or_raise_the_withdrawal_once_a_year(monthly_return, change):
+    returns = np.full((1, 24), monthly_return)
+    withdrawals = simulate_withdrawals(np.array([1000.0]), returns, "guardrails", monthly_withdrawal=4,
+                                       annual_inflation=0.0)[1]
+
+    np.testing.assert_allclose(withdrawals[0, :12], 4)
+    np.testing.assert_allclose(withdrawals[0, 12:], 4 * change)
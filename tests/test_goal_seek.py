@@ -0,0 +1,43 @@
+import numpy as np
+from goal_seek import required_contribution, required_months
+from path_cache import PathCache
+from simulation_engine import gaussian_sampler
+
+MEANS = np.array([0.07 / 12, 0.035 / 12, 0.015 / 12])
+STDS = np.array([0.15 / np.sqrt(12), 0.06 / np.sqrt(12), 0.01 / np.sqrt(12)])
+WEIGHTS = np.array([0.6, 0.3, 0.1])
+
+
+def paths(simulations=1000):
+    return PathCache(gaussian_sampler(MEANS, STDS, WEIGHTS), simulations, seed=3)
+
+
+def success_rate(cache, initial_deposit, monthly_contribution, months, target):
+    final_values = cache.values(initial_deposit, monthly_contribution, months)[:, -1]
+    # Allow for rounding at the path whose threshold is the solved contribution
+    return np.mean(final_values >= target * (1 - 1e-12))
+
+
+def test_required_contribution_is_the_smallest_reaching_the_confidence():
+    cache = paths()
+    contribution = required_contribution(cache, 10000, 240, 500000, 0.9)
+
+    assert success_rate(cache, 10000, contribution, 240, 500000) == 0.9
+    assert success_rate(cache, 10000, contribution * 0.999, 240, 500000) == 0.899
+
+
+def test_required_contribution_is_zero_when_the_deposit_is_enough():
+    assert required_contribution(paths(), 100000, 120, 50000, 0.9) == 0.0
+
+
+def test_required_months_is_the_first_yearly_horizon_reaching_the_confidence():
+    cache = paths()
+    months = required_months(cache, 10000, 1000, 500000, 0.75, max_months=600)
+
+    rates = {horizon: success_rate(cache, 10000, 1000, horizon, 500000) for horizon in range(12, 601, 12)}
+    assert months == min(horizon for horizon, rate in rates.items() if rate >= 0.75)
+    assert months % 12 == 0 and rates[months - 12] < 0.75
+
+
+def test_required_months_is_none_when_the_target_is_out_of_reach():
+    assert required_months(paths(), 10000, 100, 1e9, 0.9, max_months=120) is None
@@ -0,0 +1,55 @@
+import pytest
+from investments import validate_investments
+
+
+def investment(**fields):
+    return {"asset_name": "Apple Inc.", "ticker": "AAPL", "allocation": "100%", "category": "Stock",
+            "rationale": "", **fields}
+
+
+def test_tickers_are_normalized_and_dropped_outside_stocks():
+    investments = validate_investments([investment(ticker=" $aapl ", allocation="60%"),
+                                        investment(asset_name="Bonds", ticker="BND", allocation="40%",
+                                                   category="Bond")])
+    assert [item["ticker"] for item in investments] == ["AAPL", ""]
+
+
+@pytest.mark.parametrize("alias, category", [
+    ("stocks", "Stock"), (" Equities ", "Stock"), ("fixed income", "Bond"), ("BONDS", "Bond"),
+    ("Money Market", "Cash"), ("cash", "Cash"),
+])
+def test_category_aliases_are_normalized(alias, category):
+    ticker = "AAPL" if category == "Stock" else ""
+    assert validate_investments([investment(ticker=ticker, category=alias)])[0]["category"] == category
+
+
+def test_stock_without_a_ticker_is_rejected():
+    with pytest.raises(ValueError, match="no ticker"):
+        validate_investments([investment(ticker="")])
+
+
+@pytest.mark.parametrize("allocation", ["a lot", "-5%", "nan", None])
+def test_invalid_allocations_are_rejected(allocation):
+    with pytest.raises(ValueError):
+        validate_investments([investment(allocation=allocation)])
+
+
+def test_totals_near_100_percent_are_rescaled():
+    investments = validate_investments([investment(allocation="60%"),
+                                        investment(asset_name="Cash", ticker="", allocation="41%", category="Cash")])
+    assert [item["weight"] for item in investments] == pytest.approx([60 / 101, 41 / 101])
+
+
+@pytest.mark.parametrize("allocations", [("60%", "30%"), ("60%", "50%"), ("0%", "0%")])
+def test_totals_outside_the_tolerance_are_rejected(allocations):
+    data = [investment(allocation=allocations[0]),
+            investment(asset_name="Cash", ticker="", allocation=allocations[1], category="Cash")]
+    with pytest.raises(ValueError, match="add up to"):
+        validate_investments(data)
+
+
+def test_normalized_investments_validate_unchanged():
+    investments = validate_investments({"portfolio": [investment(allocation="70%"),
+                                                      investment(asset_name="Bonds", ticker="", allocation="30%",
+                                                                 category="Bond")]})
+    assert validate_investments(investments) == investments
@@ -0,0 +1,36 @@
+import json
+import pytest
+from json_stream import JsonArrayStream
+
+ITEMS = [
+    {"asset_name": "Apple Inc.", "ticker": "AAPL", "allocation": "60%", "category": "Stock",
+     "rationale": "Braces } and brackets ] in \"quoted\" text."},
+    {"asset_name": "Bonds", "ticker": "", "allocation": "40%", "category": "Bond", "rationale": "Nested [{}]"},
+]
+TEXT = "Here is the portfolio:\n```json\n" + json.dumps(ITEMS, indent=2) + "\n```"
+
+
+def test_every_split_point_yields_the_same_items():
+    for split in range(len(TEXT) + 1):
+        stream = JsonArrayStream()
+        completed = stream.feed(TEXT[:split]) + stream.feed(TEXT[split:])
+        assert completed == ITEMS
+        assert stream.items == ITEMS
+
+
+def test_single_character_chunks_yield_each_item_once():
+    stream = JsonArrayStream()
+    completed = [item for character in TEXT for item in stream.feed(character)]
+    assert completed == ITEMS
+    assert stream.text == TEXT
+
+
+def test_text_after_the_array_is_ignored():
+    stream = JsonArrayStream()
+    stream.feed(json.dumps(ITEMS) + ' [{"extra": 1}]')
+    assert stream.items == ITEMS
+
+
+def test_invalid_item_raises():
+    with pytest.raises(json.JSONDecodeError):
+        JsonArrayStream().feed('[{"ticker": AAPL}]')
@@ -0,0 +1,33 @@
+import numpy as np
+from path_cache import PathCache
+from simulation_engine import correlated_sampler, gaussian_sampler
+
+MEANS = np.array([0.07 / 12, 0.035 / 12, 0.015 / 12])
+STDS = np.array([0.15 / np.sqrt(12), 0.06 / np.sqrt(12), 0.01 / np.sqrt(12)])
+WEIGHTS = np.array([0.6, 0.3, 0.1])
+
+
+def test_extending_gives_the_paths_of_a_fresh_sample():
+    extended = PathCache(gaussian_sampler(MEANS, STDS, WEIGHTS), 100, seed=5)
+    extended.extend(24)
+    extended.extend(61)
+    fresh = PathCache(gaussian_sampler(MEANS, STDS, WEIGHTS), 100, seed=5)
+
+    np.testing.assert_allclose(extended.values(10000, 500, 61), fresh.values(10000, 500, 61), rtol=1e-12)
+
+
+def test_extending_holdings_gives_the_paths_of_a_fresh_sample():
+    covariance = np.diag(STDS ** 2)
+    extended = PathCache(correlated_sampler(MEANS, covariance), 100, seed=5, asset_weights=WEIGHTS)
+    extended.extend(13)
+    extended.extend(48)
+    fresh = PathCache(correlated_sampler(MEANS, covariance), 100, seed=5, asset_weights=WEIGHTS)
+
+    np.testing.assert_allclose(extended.values(10000, 500, 48), fresh.values(10000, 500, 48), rtol=1e-12)
+
+
+def test_values_are_linear_in_the_cash_flows():
+    cache = PathCache(gaussian_sampler(MEANS, STDS, WEIGHTS), 50, seed=1)
+    combined = cache.values(10000, 500, 36)
+    np.testing.assert_allclose(combined, cache.values(10000, 0, 36) + cache.values(0, 500, 36))
+    np.testing.assert_allclose(combined[:, 0], 10000)
@@ -0,0 +1,93 @@
+import json
+import pytest
+from portfolio_store import PortfolioStore, profile_fingerprint
+
+USER_DATA = {"age": 30, "Initial_investment": 10000, "monthly_contribution": 500, "retirement_age": 65,
+             "ethical_values": ["Renewable energy", "Animal welfare"], "risk_aversion": "Medium"}
+INVESTMENTS = [
+    {"asset_name": "Apple Inc.", "ticker": "aapl", "allocation": "60%", "category": "stocks", "rationale": ""},
+    {"asset_name": "Bonds", "ticker": "", "allocation": "40%", "category": "Bond", "rationale": ""},
+]
+
+
+def write_legacy(path, portfolios):
+    path.write_text(json.dumps([
+        {"portfolio_name": name, "user_data": user_data, "portfolio": investments}
+        for name, user_data, investments in portfolios
+    ]))
+
+
+def test_legacy_json_is_migrated_once(tmp_path):
+    legacy_path = tmp_path / "portfolios.json"
+    write_legacy(legacy_path, [("Legacy", USER_DATA, INVESTMENTS), ("Other", dict(USER_DATA, age=40), INVESTMENTS)])
+    db_path = str(tmp_path / "portfolios.db")
+
+    store = PortfolioStore(db_path, str(legacy_path))
+    assert list(store.list_names().values()) == ["Legacy", "Other"]
+    assert store.get_by_name("Other")["user_data"]["age"] == 40
+    assert store.get_by_name("Missing") is None
+
+    # A new store on the same database must not import the file again
+    assert list(PortfolioStore(db_path, str(legacy_path)).list_names().values()) == ["Legacy", "Other"]
+
+
+def test_portfolios_sharing_a_name_are_looked_up_by_id(tmp_path):
+    store = PortfolioStore(str(tmp_path / "portfolios.db"), str(tmp_path / "missing.json"))
+    first = store.add(USER_DATA, INVESTMENTS, "Retirement")
+    second = store.add(dict(USER_DATA, age=50), INVESTMENTS, "Retirement")
+
+    assert store.list_names() == {first: "Retirement", second: "Retirement"}
+    assert store.get(second)["user_data"]["age"] == 50
+    assert store.get(first)["id"] == first
+    assert store.get(second + 1) is None
+    assert store.get_by_name("Retirement")["id"] == first
+
+def test_fingerprint_ignores_value_order_and_number_types():
+    reordered = dict(USER_DATA, age=30.0, ethical_values=list(reversed(USER_DATA["ethical_values"])))
+    assert profile_fingerprint(reordered) == profile_fingerprint(USER_DATA)
+    assert profile_fingerprint(dict(USER_DATA, age=31)) != profile_fingerprint(USER_DATA)
+
+
+def test_find_by_profile_returns_the_first_equivalent_profile(tmp_path):
+    store = PortfolioStore(str(tmp_path / "portfolios.db"), str(tmp_path / "missing.json"))
+    store.add(USER_DATA, INVESTMENTS, "First")
+    store.add_many([(dict(USER_DATA, age=50), INVESTMENTS, "Second"), (USER_DATA, INVESTMENTS, "Duplicate")])
+
+    found = store.find_by_profile(dict(USER_DATA, ethical_values=list(reversed(USER_DATA["ethical_values"]))))
+    assert found["portfolio_name"] == "First"
+    assert store.find_by_profile(dict(USER_DATA, age=50))["portfolio_name"] == "Second"
+    assert store.find_by_profile(dict(USER_DATA, age=51)) is None
+
+
+def test_investments_are_normalized_and_invalid_ones_hidden(tmp_path):
+    legacy_path = tmp_path / "portfolios.json"
+    broken = [{"asset_name": "No ticker", "allocation": "100%", "category": "Stock"}]
+    write_legacy(legacy_path, [("Legacy", USER_DATA, INVESTMENTS), ("Broken", dict(USER_DATA, age=40), broken)])
+
+    store = PortfolioStore(str(tmp_path / "portfolios.db"), str(legacy_path))
+    legacy = store.get_by_name("Legacy")
+    assert [investment["ticker"] for investment in legacy["portfolio"]] == ["AAPL", ""]
+    assert [investment["category"] for investment in legacy["portfolio"]] == ["Stock", "Bond"]
+    assert [investment["weight"] for investment in legacy["portfolio"]] == [0.6, 0.4]
+    assert list(store.list_names().values()) == ["Legacy"]
+    assert store.get_by_name("Broken") is None
+    assert store.find_by_profile(dict(USER_DATA, age=40)) is None
+
+
+def test_results_are_read_only(tmp_path):
+    store = PortfolioStore(str(tmp_path / "portfolios.db"), str(tmp_path / "missing.json"))
+    store.add(USER_DATA, INVESTMENTS, "First")
+    portfolio = store.get_by_name("First")
+    assert store.get_by_name("First") is portfolio
+    with pytest.raises(TypeError):
+        portfolio["portfolio_name"] = "Renamed"
+    with pytest.raises(TypeError):
+        portfolio["portfolio"][0]["weight"] = 1.0
+
+
+def test_writes_from_another_store_are_seen(tmp_path):
+    db_path = str(tmp_path / "portfolios.db")
+    reader = PortfolioStore(db_path, str(tmp_path / "missing.json"))
+    assert reader.list_names() == {}
+    PortfolioStore(db_path, str(tmp_path / "missing.json")).add(USER_DATA, INVESTMENTS, "Elsewhere")
+    assert list(reader.list_names().values()) == ["Elsewhere"]
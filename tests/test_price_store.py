@@ -0,0 +1,54 @@
+import os
+import pandas as pd
+from price_store import PRICE_COLUMN, PriceStore, csv_fetcher
+
+
+def write_fixture(directory, ticker, prices):
+    prices.rename(PRICE_COLUMN).rename_axis("Date").to_frame().to_csv(os.path.join(directory, f"{ticker}.csv"))
+
+
+def history(start, periods, scale=1.0):
+    dates = pd.bdate_range(start, periods=periods)
+    return pd.Series([scale * (100.0 + day) for day in range(periods)], index=dates)
+
+
+def test_csv_fetcher_filters_on_start(tmp_path):
+    write_fixture(tmp_path, "AAA", history("2024-01-01", 10))
+    fetch = csv_fetcher(str(tmp_path))
+    assert len(fetch("AAA")) == 10
+    assert fetch("AAA", pd.Timestamp("2024-01-08")).index[0] == pd.Timestamp("2024-01-08")
+
+
+def test_stale_ticker_only_appends_new_bars(tmp_path):
+    fixtures = tmp_path / "fixtures"
+    fixtures.mkdir()
+    write_fixture(fixtures, "AAA", history("2024-01-01", 20))
+    calls = []
+
+    def fetcher(ticker, start=None):
+        calls.append(start)
+        return csv_fetcher(str(fixtures))(ticker, start)
+
+    store = PriceStore(str(tmp_path / "cache"), ttl_seconds=0, fetcher=fetcher)
+    store.get_prices("AAA")
+    write_fixture(fixtures, "AAA", history("2024-01-01", 25))
+    prices = store.get_prices("AAA")
+
+    assert len(prices) == 25
+    assert calls[0] is None and calls[1] is not None and len(calls) == 2
+    pd.testing.assert_series_equal(prices, history("2024-01-01", 25), check_names=False, check_freq=False)
+
+
+def test_readjusted_history_is_fetched_again(tmp_path):
+    fixtures = tmp_path / "fixtures"
+    fixtures.mkdir()
+    write_fixture(fixtures, "AAA", history("2024-01-01", 20))
+    store = PriceStore(str(tmp_path / "cache"), ttl_seconds=0, fetcher=csv_fetcher(str(fixtures)))
+    store.get_prices("AAA")
+
+    # A 2-for-1 split halves every adjusted close, including the cached ones
+    write_fixture(fixtures, "AAA", history("2024-01-01", 25, scale=0.5))
+    prices = store.get_prices("AAA")
+
+    pd.testing.assert_series_equal(prices, history("2024-01-01", 25, scale=0.5), check_names=False, check_freq=False)
+    pd.testing.assert_series_equal(store.get_prices("AAA"), prices, check_freq=False)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("streamlit")
+from simulation import monte_carlo_simulation
+
+ALLOCATIONS = ([], 0.0, None, 0.6, 0.4)
+INPUTS = {"means": np.array([0.035 / 12, 0.015 / 12]), "stds": np.array([0.06 / np.sqrt(12), 0.01 / np.sqrt(12)]),
+          "weights": np.array([0.6, 0.4])}
+
+
+def simulate(**options):
+    return monte_carlo_simulation(*ALLOCATIONS, 10000, 500, 2, 64, seed=1, inputs=INPUTS, **options)
+
+
+@pytest.mark.parametrize("options", [
+    {"workers": 2, "streaming": True},
+    {"streaming": True, "incremental": True},
+    {"workers": 2, "incremental": True},
+    {"variance_reduction": "sobol", "workers": 2},
+    {"variance_reduction": "antithetic", "streaming": True},
+    {"variance_reduction": "sobol", "incremental": True},
+    {"variance_reduction": "sobol", "model": "bootstrap"},
+    {"streaming": True, "model": "correlated"},
+    {"model": "lognormal"},
+])
+def test_unsupported_option_combinations_are_rejected(options):
+    with pytest.raises(ValueError):
+        simulate(**options)
+
+
+def test_supported_options_simulate_every_month():
+    for options in ({}, {"streaming": True}, {"variance_reduction": "antithetic"}, {"variance_reduction": "sobol"}):
+        result = simulate(**options)
+        assert result.bands.shape == (len(result.percentiles), 25)
+        assert np.isfinite(result.bands).all()
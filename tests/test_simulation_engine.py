@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+from quantile_sketch import MonthlyQuantileSketch
+from simulation_engine import (_brownian_bridge, cholesky_factor, correlated_sampler, gaussian_sampler, normal_draws,
+                               percentile_bands, project_values, simulate_percentiles_parallel,
+                               simulate_percentiles_streaming, simulate_values)
+
+MEANS = np.array([0.07 / 12, 0.035 / 12, 0.015 / 12])
+STDS = np.array([0.15 / np.sqrt(12), 0.06 / np.sqrt(12), 0.01 / np.sqrt(12)])
+WEIGHTS = np.array([0.6, 0.3, 0.1])
+
+
+def legacy_values(initial_deposit, monthly_contribution, months, simulations, seed):
+    # The loop the vectorized engine replaced: one draw per asset class, per month, per path
+    np.random.seed(seed)
+    values = np.zeros((simulations, months + 1))
+    for simulation in range(simulations):
+        value = initial_deposit
+        values[simulation, 0] = value
+        for month in range(months):
+            total_return = sum(np.random.normal(mean, std) * weight for mean, std, weight in zip(MEANS, STDS, WEIGHTS))
+            value = (value + monthly_contribution) * (1 + total_return)
+            values[simulation, month + 1] = value
+    return values
+
+
+def test_simulate_values_matches_legacy_loop():
+    expected = legacy_values(10000, 500, 36, 50, seed=42)
+    values = simulate_values(MEANS, STDS, WEIGHTS, 10000, 500, 36, 50, seed=42, chunk_size=16)
+    np.testing.assert_allclose(values, expected, rtol=1e-10)
+
+
+def test_percentile_bands_match_pandas_quantiles():
+    values = simulate_values(MEANS, STDS, WEIGHTS, 10000, 500, 36, 200, seed=7)
+    frame = pd.DataFrame(values)
+    bands = percentile_bands(values, (50, 95, 5))
+    np.testing.assert_allclose(bands[0], frame.median(axis=0))
+    np.testing.assert_allclose(bands[1], frame.quantile(0.95, axis=0))
+    np.testing.assert_allclose(bands[2], frame.quantile(0.05, axis=0))
+
+
+def test_sketch_is_within_relative_accuracy_of_closest_order_statistic():
+    values = np.random.default_rng(3).lognormal(10, 1, size=(5000, 4))
+    values[:10] = 0
+    sketch = MonthlyQuantileSketch(4)
+    for start in range(0, len(values), 1000):
+        sketch.add(values[start:start + 1000])
+
+    percentiles = (5, 50, 95)
+    ranks = np.round(np.array(percentiles) / 100 * (len(values) - 1)).astype(int)
+    exact = np.sort(values, axis=0)[ranks]
+    np.testing.assert_allclose(sketch.percentiles(percentiles), exact, rtol=sketch.relative_accuracy)
+
+
+def test_streaming_percentiles_are_within_half_a_percent():
+    percentiles = (5, 50, 95)
+    exact = percentile_bands(simulate_values(MEANS, STDS, WEIGHTS, 10000, 500, 120, 20000, seed=11), percentiles)
+    estimated = simulate_percentiles_streaming(MEANS, STDS, WEIGHTS, 10000, 500, 120, 20000,
+                                               percentiles=percentiles, seed=11, chunk_size=3000)
+    np.testing.assert_allclose(estimated, exact, rtol=0.005)
+
+
+def test_parallel_percentiles_do_not_depend_on_the_number_of_workers():
+    sampler = gaussian_sampler(MEANS, STDS, WEIGHTS)
+    single = simulate_percentiles_parallel(sampler, 10000, 500, 24, 2000, seed=5, workers=1, block_size=250)
+    pooled = simulate_percentiles_parallel(sampler, 10000, 500, 24, 2000, seed=5, workers=4, block_size=250)
+    np.testing.assert_array_equal(pooled, single)
+
+    blocks = np.random.SeedSequence(5).spawn(8)
+    returns = np.vstack([sampler(np.random.default_rng(block), 250, 24) for block in blocks])
+    exact = percentile_bands(project_values(returns, 10000, 500))
+    np.testing.assert_allclose(single, exact, rtol=0.01)
+
+
+def test_parallel_percentiles_shard_correlated_holdings():
+    sampler = correlated_sampler(MEANS, np.diag(STDS ** 2))
+    single = simulate_percentiles_parallel(sampler, 10000, 500, 24, 600, seed=5, workers=1, block_size=150,
+                                           asset_weights=WEIGHTS)
+    pooled = simulate_percentiles_parallel(sampler, 10000, 500, 24, 600, seed=5, workers=4, block_size=150,
+                                           asset_weights=WEIGHTS)
+    assert single.shape == (3, 25)
+    np.testing.assert_array_equal(pooled, single)
+
+
+def test_cholesky_cache_is_shared_safely_across_threads():
+    random_state = np.random.default_rng(0)
+    matrices = [np.cov(random_state.standard_normal((4, 20))) for _ in range(50)] * 4
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        factors = list(executor.map(cholesky_factor, matrices))
+
+    for covariance, factor in zip(matrices, factors):
+        np.testing.assert_allclose(factor @ factor.T, covariance, atol=1e-12)
+        assert not factor.flags.writeable
+
+
+def test_antithetic_draws_come_in_opposite_pairs():
+    draws = normal_draws("antithetic", 12, 3, seed=2)(7)
+    assert draws.shape == (7, 12, 3)
+    np.testing.assert_array_equal(draws[4:], -draws[:3])
+
+    draw = normal_draws("antithetic", 12, 3, seed=2)
+    first, second = draw(8), draw(8)
+    np.testing.assert_array_equal(first[4:], -first[:4])
+    assert not np.array_equal(first, second)
+
+
+def test_brownian_bridge_keeps_independent_standard_normal_increments():
+    # The bridge is linear: its increments are independent N(0, 1) if the map is orthogonal
+    months = 12
+    bridge = _brownian_bridge(np.eye(months)[:, :, np.newaxis])[:, :, 0]
+    np.testing.assert_allclose(bridge.T @ bridge, np.eye(months), atol=1e-12)
+
+
+def test_sobol_draws_fall_back_to_pseudo_random_past_max_dimensions(monkeypatch):
+    monkeypatch.setattr(qmc.Sobol, "MAXDIM", 16)
+    draws = normal_draws("sobol", 12, 3, seed=4)(4096)
+    assert draws.shape == (4096, 12, 3)
+    assert np.isfinite(draws).all()
+    np.testing.assert_allclose(draws.mean(axis=0), 0, atol=0.1)
+    np.testing.assert_allclose(draws.std(axis=0), 1, atol=0.1)